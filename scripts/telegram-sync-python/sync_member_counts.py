@@ -7,6 +7,7 @@ Updates the TelegramChat.memberCount field in the database.
 import os
 import sys
 import asyncio
+import random
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -14,7 +15,7 @@ import psycopg2
 from telethon import TelegramClient
 from telethon.tl.functions.channels import GetFullChannelRequest
 from telethon.tl.functions.messages import GetFullChatRequest
-from telethon.errors import ChatAdminRequiredError, ChannelPrivateError, FloodWaitError
+from telethon.errors import ChatAdminRequiredError, ChannelPrivateError, FloodWaitError, RpcCallFailError
 from dotenv import load_dotenv
 
 # Load environment
@@ -30,6 +31,75 @@ API_ID = int(os.getenv('TELEGRAM_API_ID', '0'))
 API_HASH = os.getenv('TELEGRAM_API_HASH', '')
 PHONE = os.getenv('TELEGRAM_PHONE_NUMBER', '')
 
+# Only re-check chats whose member count is older than this
+STALE_AFTER = os.getenv('STALE_AFTER_HOURS', '6')
+BATCH_SIZE = int(os.getenv('MEMBER_SYNC_BATCH_SIZE', '500'))
+COMMIT_EVERY = 100  # Rows per transaction
+
+# Transient RPC failures are retried with exponential backoff (1s, 2s + jitter).
+# FloodWaitError is deliberately not retried here - main() honours e.seconds.
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1.0
+RETRYABLE_ERRORS = (TimeoutError, RpcCallFailError)
+
+# Resolved input peers, keyed by Telegram chat ID
+ENTITY_CACHE = {}
+
+
+async def resolve(client, chat_id: int):
+    """Resolve a chat ID to an input peer, reusing previous lookups."""
+    peer = ENTITY_CACHE.get(chat_id)
+    if peer is None:
+        try:
+            # Build the InputPeer straight from the session's entity table
+            # (stored access_hash) - no MTProto call at all
+            peer = client.session.get_input_entity(chat_id)
+        except ValueError:
+            # Not in the session yet - let Telethon fetch it
+            peer = await client.get_input_entity(chat_id)
+        ENTITY_CACHE[chat_id] = peer
+    return peer
+
+
+async def call_with_retry(client, request):
+    """Invoke a Telethon request, retrying transient failures with backoff."""
+    for attempt in range(RETRY_ATTEMPTS):
+        try:
+            return await client(request)
+        except RETRYABLE_ERRORS as e:
+            if attempt == RETRY_ATTEMPTS - 1:
+                raise
+            delay = RETRY_BASE_DELAY * (2 ** attempt) * (1 + random.uniform(0, 0.2))
+            print(f"({type(e).__name__}, retrying in {delay:.1f}s)", end=" ")
+            await asyncio.sleep(delay)
+
+
+def mark_checked(cursor, tc_id: str, member_count=None) -> None:
+    """
+    Stamp lastSyncedAt (and memberCount, when given) for one chat.
+
+    Runs inside its own savepoint: a failed UPDATE is rolled back alone
+    and the uncommitted rest of the batch survives for the next commit.
+    """
+    cursor.execute("SAVEPOINT chat_row")
+    try:
+        if member_count is None:
+            cursor.execute("""
+                UPDATE telegram_crm."TelegramChat"
+                SET "lastSyncedAt" = NOW()
+                WHERE id = %s
+            """, (tc_id,))
+        else:
+            cursor.execute("""
+                UPDATE telegram_crm."TelegramChat"
+                SET "memberCount" = %s, "lastSyncedAt" = NOW()
+                WHERE id = %s
+            """, (member_count, tc_id))
+    except psycopg2.Error:
+        cursor.execute("ROLLBACK TO SAVEPOINT chat_row")
+        raise
+    cursor.execute("RELEASE SAVEPOINT chat_row")
+
 
 async def main():
     """Main function."""
@@ -39,21 +109,28 @@ async def main():
 
     # Connect to database
     conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = False  # Commit in batches, not per row
     cursor = conn.cursor()
 
-    # Get all groups and supergroups
+    # Get groups and supergroups that haven't been checked recently
+    # (stalest first, so repeated runs work through the backlog)
     cursor.execute("""
         SELECT tc.id, tc."telegramChatId", tc.type, tc.title, tc."memberCount"
         FROM telegram_crm."TelegramChat" tc
         WHERE tc.type IN ('group', 'supergroup')
-        ORDER BY tc."lastSyncedAt" DESC NULLS LAST
-    """)
+          AND (tc."lastSyncedAt" IS NULL
+               OR tc."lastSyncedAt" < NOW() - (%s || ' hours')::interval)
+        ORDER BY tc."lastSyncedAt" ASC NULLS FIRST
+        LIMIT %s
+    """, (STALE_AFTER, BATCH_SIZE))
 
     chats = cursor.fetchall()
-    print(f"Found {len(chats)} groups/supergroups to update\n")
+    print(f"Found {len(chats)} groups/supergroups not synced in the last {STALE_AFTER}h\n")
 
     if not chats:
-        print("No groups found!")
+        print("All groups are up to date!")
+        cursor.close()
+        conn.close()
         return
 
     # Connect to Telegram
@@ -66,9 +143,11 @@ async def main():
     updated = 0
     skipped = 0
     failed = 0
+    updates_since_commit = 0
 
     for tc_id, chat_id, chat_type, title, current_count in chats:
         print(f"  {title or 'Unknown'}...", end=" ")
+        checked = False
 
         try:
             chat_id_int = int(chat_id)
@@ -77,40 +156,29 @@ async def main():
             if chat_type == 'supergroup' or chat_id_int < 0:
                 # Supergroups and channels use GetFullChannelRequest
                 try:
-                    entity = await client.get_entity(chat_id_int)
-                    full_chat = await client(GetFullChannelRequest(entity))
+                    entity = await resolve(client, chat_id_int)
+                    full_chat = await call_with_retry(client, GetFullChannelRequest(entity))
                     member_count = full_chat.full_chat.participants_count
                 except Exception:
                     # Try as regular group
-                    try:
-                        full_chat = await client(GetFullChatRequest(abs(chat_id_int)))
-                        member_count = len(full_chat.users)
-                    except Exception as e:
-                        print(f"Error: {e}")
-                        failed += 1
-                        continue
+                    full_chat = await call_with_retry(client, GetFullChatRequest(abs(chat_id_int)))
+                    member_count = len(full_chat.users)
             else:
                 # Regular groups
-                try:
-                    full_chat = await client(GetFullChatRequest(abs(chat_id_int)))
-                    member_count = len(full_chat.users)
-                except Exception as e:
-                    print(f"Error: {e}")
-                    failed += 1
-                    continue
+                full_chat = await call_with_retry(client, GetFullChatRequest(abs(chat_id_int)))
+                member_count = len(full_chat.users)
 
             if member_count and member_count != current_count:
-                cursor.execute("""
-                    UPDATE telegram_crm."TelegramChat"
-                    SET "memberCount" = %s, "lastSyncedAt" = NOW()
-                    WHERE id = %s
-                """, (member_count, tc_id))
-                conn.commit()
+                mark_checked(cursor, tc_id, member_count)
                 print(f"{member_count} members (updated)")
                 updated += 1
+                checked = True
             else:
+                # Unchanged - still mark as checked so the next run skips it
+                mark_checked(cursor, tc_id)
                 print(f"{member_count or current_count or '?'} members")
                 skipped += 1
+                checked = True
 
             await asyncio.sleep(0.3)  # Rate limit
 
@@ -123,10 +191,33 @@ async def main():
             print("Access denied")
             skipped += 1
 
+        except psycopg2.Error as e:
+            # mark_checked() rolled back to its savepoint, so the rows
+            # already in this batch are still committed below
+            print(f"DB error: {e}")
+            failed += 1
+
         except Exception as e:
-            print(f"Error: {type(e).__name__}")
+            print(f"Error: {type(e).__name__}: {e}")
             failed += 1
 
+        if not checked:
+            # Denied, failed and flood-waited chats are stamped too, so they
+            # rotate to the back of the stalest-first queue instead of
+            # pinning its head (and costing RPCs) on every run
+            try:
+                mark_checked(cursor, tc_id)
+            except psycopg2.Error as e:
+                print(f"  DB error: {e}")
+
+        updates_since_commit += 1
+        if updates_since_commit >= COMMIT_EVERY:
+            conn.commit()
+            updates_since_commit = 0
+
+    # Flush the last partial batch
+    conn.commit()
+
     # Summary
     print("\n" + "=" * 60)
     print(f"  Updated: {updated}")
@@ -6,7 +6,8 @@ This provides 100% reliable locking for sync coordination:
 - Locks are stored in PostgreSQL (survives crashes)
 - Auto-expiration via expiresAt column (handles zombie processes)
 - Heartbeat mechanism to keep locks alive
-- Single process enforcement for listener
+- Single process enforcement for listener (PostgreSQL advisory lock,
+  released by the server as soon as the holder's connection drops)
 
 Usage:
     from lock_manager import SyncLockManager
@@ -27,16 +28,47 @@ Usage:
         print(f"Listener running on {holder['hostname']}, PID {holder['process_id']}")
 """
 
+import hashlib
 import socket
 import os
 import uuid
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, Any, List, Tuple
+from typing import Optional, Dict, Any, List, Tuple, Union
 
 import psycopg2
 from psycopg2.extras import Json
 
 
+class PreparingConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers which statements it has PREPAREd."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: set = set()
+
+
+def execute_prepared(cursor, name: str, sql: str, params: tuple = ()) -> None:
+    """
+    Execute sql ($n placeholders) as a server-side prepared statement.
+
+    The statement is PREPAREd the first time it runs on a connection, so
+    later calls skip Postgres' parse/plan step. The cursor must belong to
+    a PreparingConnection, and callers clear its prepared set on rollback.
+    """
+    prepared = cursor.connection.prepared
+    if name not in prepared:
+        # The set is cleared after a rollback, so check before re-preparing
+        cursor.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (name,))
+        if cursor.fetchone() is None:
+            cursor.execute(f"PREPARE {name} AS {sql}")
+        prepared.add(name)
+
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+
+
 class SyncLockManager:
     """Database-backed distributed lock manager with automatic expiration."""
 
@@ -163,6 +195,73 @@ class SyncLockManager:
         finally:
             cursor.close()
 
+    @staticmethod
+    def advisory_key(lock_type: str, lock_key: str = 'all') -> int:
+        """Stable signed 64-bit advisory lock key for a (lock_type, lock_key) pair."""
+        digest = hashlib.blake2b(f"{lock_type}:{lock_key}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big', signed=True)
+
+    def try_advisory_lock(self, lock_type: str, lock_key: str = 'all') -> bool:
+        """
+        Attempt to take a session-scoped PostgreSQL advisory lock.
+
+        The lock lives as long as this manager's connection: there is no
+        expiry or heartbeat, and a crashed holder can never leave it stale.
+
+        Returns:
+            True if lock acquired (or already held by this connection)
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)",
+                           (self.advisory_key(lock_type, lock_key),))
+            acquired = cursor.fetchone()[0]
+            self.conn.commit()
+            return acquired
+
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+        finally:
+            cursor.close()
+
+    def advisory_lock_holder(self, lock_type: str, lock_key: str = 'all') -> Optional[Dict[str, Any]]:
+        """
+        Find the backend holding an advisory lock (for diagnostics).
+
+        Returns:
+            Dict with the holder's backend info, None if not held
+        """
+        # pg_locks splits a bigint advisory key into two unsigned 32-bit halves
+        key = self.advisory_key(lock_type, lock_key) & 0xFFFFFFFFFFFFFFFF
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT a.pid, host(a.client_addr), a.application_name, a.backend_start
+                FROM pg_locks l
+                JOIN pg_stat_activity a ON a.pid = l.pid
+                WHERE l.locktype = 'advisory'
+                  AND l.classid = %s::oid
+                  AND l.objid = %s::oid
+                  AND l.objsubid = 1
+                  AND l.granted
+                LIMIT 1
+            """, (key >> 32, key & 0xFFFFFFFF))
+            row = cursor.fetchone()
+            self.conn.commit()
+
+            if row:
+                return {
+                    'pid': row[0],
+                    'client_addr': row[1],
+                    'application_name': row[2],
+                    'backend_start': row[3],
+                }
+            return None
+
+        finally:
+            cursor.close()
+
     def release(self, lock_type: str, lock_key: str = 'all') -> bool:
         """
         Release a lock.
@@ -406,7 +505,12 @@ class SyncLockManager:
 
 
 class ListenerStateManager:
-    """Manage persistent listener state in database."""
+    """
+    Manage persistent listener state in database.
+
+    conn must be a PreparingConnection: the recurring state writes go
+    through execute_prepared().
+    """
 
     def __init__(self, conn, schema: str = 'telegram_crm'):
         self.conn = conn
@@ -415,19 +519,27 @@ class ListenerStateManager:
         self.hostname = socket.gethostname()
 
     def update_state(self, status: str, messages_received: int = 0,
-                     errors: Optional[List] = None) -> None:
-        """Update listener state in database."""
+                     errors: Optional[Union[List, str]] = None) -> None:
+        """
+        Update listener state in database.
+
+        errors may be a list of entries or an already-serialized JSON array,
+        for callers that keep the payload ready between writes.
+        """
+        if isinstance(errors, list):
+            errors = Json(errors) if errors else None
+
         cursor = self.conn.cursor()
         try:
-            cursor.execute(f"""
+            execute_prepared(cursor, 'listener_update_state', f"""
                 INSERT INTO {self.schema}."ListenerState" (
                     id, status, "lastHeartbeat", "processId", hostname,
                     "startedAt", "messagesReceived", errors, "updatedAt"
                 )
                 VALUES (
-                    'singleton', %s, NOW(), %s, %s,
-                    CASE WHEN %s = 'running' THEN NOW() ELSE NULL END,
-                    %s, %s, NOW()
+                    'singleton', $1, NOW(), $2, $3,
+                    CASE WHEN $1 = 'running' THEN NOW() ELSE NULL END,
+                    $4, $5, NOW()
                 )
                 ON CONFLICT (id) DO UPDATE SET
                     status = EXCLUDED.status,
@@ -442,12 +554,31 @@ class ListenerStateManager:
                     "messagesReceived" = EXCLUDED."messagesReceived",
                     errors = EXCLUDED.errors,
                     "updatedAt" = NOW()
-            """, (status, self.process_id, self.hostname, status,
-                  messages_received, Json(errors) if errors else None))
+            """, (status, self.process_id, self.hostname,
+                  messages_received, errors))
             self.conn.commit()
 
         except Exception as e:
             self.conn.rollback()
+            self.conn.prepared.clear()
+            raise e
+        finally:
+            cursor.close()
+
+    def touch_heartbeat(self) -> None:
+        """Refresh lastHeartbeat only (state otherwise unchanged)."""
+        cursor = self.conn.cursor()
+        try:
+            execute_prepared(cursor, 'listener_touch_heartbeat', f"""
+                UPDATE {self.schema}."ListenerState"
+                SET "lastHeartbeat" = NOW()
+                WHERE id = 'singleton'
+            """)
+            self.conn.commit()
+
+        except Exception as e:
+            self.conn.rollback()
+            self.conn.prepared.clear()
             raise e
         finally:
             cursor.close()
@@ -483,9 +614,9 @@ class ListenerStateManager:
         """Increment message counter."""
         cursor = self.conn.cursor()
         try:
-            cursor.execute(f"""
+            execute_prepared(cursor, 'listener_increment_messages', f"""
                 UPDATE {self.schema}."ListenerState"
-                SET "messagesReceived" = "messagesReceived" + %s,
+                SET "messagesReceived" = "messagesReceived" + $1,
                     "lastMessageAt" = NOW(),
                     "lastHeartbeat" = NOW(),
                     "updatedAt" = NOW()
@@ -495,6 +626,7 @@ class ListenerStateManager:
 
         except Exception as e:
             self.conn.rollback()
+            self.conn.prepared.clear()
             raise e
         finally:
             cursor.close()
@@ -534,6 +666,40 @@ class ListenerStateManager:
         finally:
             cursor.close()
 
+    def record_poll(self, conversations_checked: int, messages_synced: int) -> None:
+        """
+        Record active poll results.
+
+        Args:
+            conversations_checked: Number of conversations polled
+            messages_synced: Number of messages found by the poll
+        """
+        cursor = self.conn.cursor()
+        try:
+            # Store poll stats in connectionInfo field as JSON
+            cursor.execute(f"""
+                UPDATE {self.schema}."ListenerState"
+                SET "connectionInfo" = jsonb_set(
+                    COALESCE("connectionInfo", '{{}}'::jsonb),
+                    '{{lastPoll}}',
+                    %s::jsonb
+                ),
+                "updatedAt" = NOW()
+                WHERE id = 'singleton'
+            """, (Json({
+                'conversationsChecked': conversations_checked,
+                'messagesSynced': messages_synced,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }),))
+            self.conn.commit()
+
+        except Exception as e:
+            self.conn.rollback()
+            # Don't raise - this is non-critical
+            print(f"Failed to record poll: {e}")
+        finally:
+            cursor.close()
+
     def record_error(self, error_type: str, error_message: str, context: Optional[Dict] = None) -> None:
         """
         Record an error to the database for visibility.
@@ -543,42 +709,45 @@ class ListenerStateManager:
             error_message: The error message
             context: Optional context dict (e.g., chat_id, conversation_id)
         """
+        self.record_errors([{
+            'type': error_type,
+            'message': error_message,
+            'context': context,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }])
+
+    def record_errors(self, error_entries: List[Dict]) -> None:
+        """
+        Append several error entries in one statement.
+
+        Args:
+            error_entries: Dicts with type, message, context and timestamp keys
+        """
         cursor = self.conn.cursor()
         try:
-            error_entry = {
-                'type': error_type,
-                'message': error_message,
-                'context': context,
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }
-
-            cursor.execute(f"""
-                UPDATE {self.schema}."ListenerState"
-                SET errors = COALESCE(errors, '[]'::jsonb) || %s::jsonb,
-                    "lastHeartbeat" = NOW(),
-                    "updatedAt" = NOW()
-                WHERE id = 'singleton'
-            """, (Json([error_entry]),))
-
-            # Trim errors to keep only last 50
-            cursor.execute(f"""
+            # Append and trim errors to keep only last 50
+            execute_prepared(cursor, 'listener_record_errors', f"""
                 UPDATE {self.schema}."ListenerState"
                 SET errors = (
-                    SELECT jsonb_agg(elem)
+                    SELECT jsonb_agg(elem ORDER BY idx)
                     FROM (
-                        SELECT elem
-                        FROM jsonb_array_elements(COALESCE(errors, '[]'::jsonb)) WITH ORDINALITY AS t(elem, idx)
+                        SELECT elem, idx
+                        FROM jsonb_array_elements(COALESCE(errors, '[]'::jsonb) || $1::jsonb)
+                             WITH ORDINALITY AS t(elem, idx)
                         ORDER BY idx DESC
                         LIMIT 50
                     ) sub
-                )
+                ),
+                    "lastHeartbeat" = NOW(),
+                    "updatedAt" = NOW()
                 WHERE id = 'singleton'
-            """)
+            """, (Json(error_entries),))
 
             self.conn.commit()
 
         except Exception as e:
             self.conn.rollback()
+            self.conn.prepared.clear()
             print(f"Failed to record error: {e}")
         finally:
             cursor.close()
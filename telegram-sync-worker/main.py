@@ -24,46 +24,292 @@ Build: v2.4-20251210 (on-demand media download)
 """
 
 import os
-import sys
 import asyncio
 import signal
-import json
+import time
 import base64
+import random
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
 from threading import Thread
 from urllib.parse import parse_qs
 from aiohttp import web
+from aiohttp.abc import AbstractAccessLogger
+import orjson
+from telethon.errors import AuthKeyDuplicatedError, UnauthorizedError
+from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument, DocumentAttributeFilename
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+try:
+    import filetype
+except ImportError:
+    filetype = None
 
 # Import our modules
 from session_manager import restore_session_from_env, backup_session, get_session_info
+from realtime_listener import RealtimeListener
 
 # Configuration
 PORT = int(os.getenv('PORT', 8080))
 SESSION_PATH = Path(os.getenv('SESSION_PATH', '/data/sessions/telegram_session'))
 LOG_PATH = Path(os.getenv('LOG_PATH', '/data/logs'))
+HEALTH_CACHE_TTL = float(os.getenv('HEALTH_CACHE_TTL', '1.0'))  # seconds
+EXECUTOR_WORKERS = int(os.getenv('EXECUTOR_WORKERS', 4))  # default executor threads (media cache I/O, listener tracebacks)
+SHUTDOWN_BACKUP_TIMEOUT = 5.0  # seconds
+BACKUP_INTERVAL = 60  # seconds between dirty-session checks
+BACKUP_MIN_AGE = 3600  # seconds; a dirty session is copied at most hourly (5 backups kept)
+REQUIRED_VARS = ('DATABASE_URL', 'TELEGRAM_API_ID', 'TELEGRAM_API_HASH')
+MAX_LISTENER_RETRIES = 10
+LISTENER_STABLE_AFTER = 300  # seconds of uptime after which a crash resets the retry budget
+DOWNLOAD_CHUNK_SIZE = 512 * 1024  # Telegram's maximum chunk size
+MEDIA_CACHE_PATH = os.getenv('MEDIA_CACHE_PATH', '/data/media_cache')
+MEDIA_CACHE_SIZE_LIMIT = int(os.getenv('MEDIA_CACHE_SIZE_LIMIT', 5 * 1024 ** 3))  # 5GB
+MEDIA_CACHE_MAX_ITEM = int(os.getenv('MEDIA_CACHE_MAX_ITEM', 50 * 1024 * 1024))  # skip caching larger files
+MEDIA_SPOOL_MEMORY = 2 * DOWNLOAD_CHUNK_SIZE  # larger downloads spool to disk while being cached
+
+# Minimum level printed by log() (DEBUG, INFO, WARN, ERROR)
+_LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARN': 30, 'ERROR': 40}
+_MIN_LOG_LEVEL = _LOG_LEVELS.get(os.getenv('LOG_LEVEL', 'INFO').upper(), 20)
+
+# Startup banner, emitted as one stdout write
+_BANNER = "\n".join(("=" * 60, "  TELEGRAM SYNC WORKER - RAILWAY EDITION", "=" * 60))
+
+
+@dataclass(slots=True)
+class WorkerState:
+    """Process-wide worker state, shared by the health server and callbacks."""
+    status: str = 'starting'
+    started_at: Optional[datetime] = None
+    messages_received: int = 0
+    last_heartbeat_mono: float = 0.0  # time.monotonic() of last heartbeat, 0 = none yet
+    errors: Deque[Dict[str, str]] = field(default_factory=lambda: deque(maxlen=20))  # last 20 errors
+    listener: Any = None  # Will hold the RealtimeListener instance
+    session_dirty: bool = False  # Session file changed since the last backup
+    last_backup_mono: float = 0.0  # time.monotonic() of last periodic backup, 0 = none yet
+
+
+@dataclass(slots=True)
+class WorkerStatus:
+    """Worker section of the /status payload."""
+    status: str
+    started_at: Optional[str]
+    messages_received: int
+    last_heartbeat: Optional[str]
+    errors: List[Dict[str, str]]
+
+
+@dataclass(slots=True)
+class EnvironmentInfo:
+    """Environment section of the /status payload."""
+    PORT: int
+    SESSION_PATH: str
+    has_database_url: bool
+    has_telegram_credentials: bool
+
+
+@dataclass(slots=True)
+class StatusPayload:
+    """Full /status response; orjson serializes slotted dataclasses natively."""
+    worker: WorkerStatus
+    session: Dict[str, Any]
+    environment: EnvironmentInfo
+
+
+# Bound once so timestamp call sites skip the global + attribute lookups
+_UTC = timezone.utc
+_utcnow = datetime.now
+_ISO_SECOND = [0, '']  # [epoch second, formatted prefix] for _iso_utcnow
+
+# Jitter source for restart backoff (seeded once from OS entropy)
+_rng = random.Random()
+# Upper bound of the jittered restart delay per attempt: 3 * 2^n seconds, max 30s
+_BACKOFF = tuple(min(30, 3 * 2 ** min(i, 4)) for i in range(MAX_LISTENER_RETRIES + 1))
 
 # Global state for health checks
-worker_state = {
-    'status': 'starting',
-    'started_at': None,
-    'messages_received': 0,
-    'last_heartbeat': None,
-    'errors': [],
-    'listener': None,  # Will hold the RealtimeListener instance
-}
-
-
-def log(message: str, level: str = 'INFO'):
-    """Simple logging with timestamp."""
+worker_state = WorkerState()
+
+# Set when a shutdown signal arrives; lets idle waits end without polling
+SHUTDOWN = asyncio.Event()
+
+# Pending periodic-backup TimerHandle (cancelled on shutdown)
+_backup_timer = None
+
+# Session backups get their own thread: /download streams its cache I/O
+# through the default executor, and the bounded shutdown backup must
+# never queue behind it
+_backup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='session-backup')
+
+# Resolved Telegram input peers for /download, keyed by chat ID
+ENTITY_CACHE = {}
+
+# Pre-serialized healthy /health body, rebuilt at most once per HEALTH_CACHE_TTL
+_HEALTH_CACHE = {'bytes': b'', 'expires_at': 0.0}
+
+# On-disk LRU of downloaded media (opened lazily, None if unavailable)
+_media_cache = None
+
+
+def _iso_utcnow() -> str:
+    """
+    Current UTC time in isoformat() layout (microseconds, +00:00).
+
+    The seconds part is formatted once per second and reused, so bursts
+    of errors only pay for the microsecond tail.
+    """
+    now = time.time()
+    sec = int(now)
+    if sec != _ISO_SECOND[0]:
+        _ISO_SECOND[0] = sec
+        _ISO_SECOND[1] = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(sec))
+    return f"{_ISO_SECOND[1]}.{int((now - sec) * 1_000_000):06d}+00:00"
+
+
+def log(message: str, *args, level: str = 'INFO'):
+    """
+    Simple logging with timestamp.
+
+    Extra positional args are %-formatted into message only after the
+    LOG_LEVEL check, so filtered-out calls skip string formatting.
+    """
+    if _LOG_LEVELS.get(level, 20) < _MIN_LOG_LEVEL:
+        return
+    if args:
+        message = message % args
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print(f"[{timestamp}] [{level}] {message}")
 
 
+async def resolve_entity(client, chat_id: int):
+    """
+    Resolve a chat ID to an input peer, caching the result.
+
+    get_input_entity returns the lightweight peer and skips the server
+    call when the session already knows the access_hash.
+    """
+    peer = ENTITY_CACHE.get(chat_id)
+    if peer is None:
+        peer = ENTITY_CACHE.setdefault(chat_id, await client.get_input_entity(chat_id))
+    return peer
+
+
+def get_media_cache():
+    """
+    Open the on-disk media cache on first use.
+
+    Returns None when diskcache is not installed or the cache directory
+    cannot be opened; /download then always goes to Telegram.
+    """
+    global _media_cache
+    if _media_cache is None and diskcache is not None:
+        try:
+            _media_cache = diskcache.Cache(
+                MEDIA_CACHE_PATH,
+                size_limit=MEDIA_CACHE_SIZE_LIMIT,
+                eviction_policy='least-recently-used',
+            )
+        except Exception as e:
+            log("[DOWNLOAD] Media cache disabled: %s", e, level='WARN')
+    return _media_cache
+
+
+def has_media_file(media) -> bool:
+    """
+    True if media has a downloadable file (a photo or a document).
+
+    Geo, contact, poll, webpage and similar media have nothing behind
+    them for iter_download to fetch.
+    """
+    if isinstance(media, MessageMediaPhoto):
+        return media.photo is not None
+    if isinstance(media, MessageMediaDocument):
+        return media.document is not None
+    return False
+
+
+def media_etag(media) -> str:
+    """
+    Strong ETag for a photo or document (see has_media_file).
+
+    Telegram never changes the bytes behind a photo/document ID, so the
+    ID identifies the payload and the tag is known before downloading.
+    """
+    if isinstance(media, MessageMediaPhoto):
+        return f'"photo-{media.photo.id}"'
+    return f'"document-{media.document.id}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    True if an If-None-Match header value matches etag.
+
+    Handles '*' and comma-separated lists, comparing weakly (W/ prefixes
+    ignored) as If-None-Match requires.
+    """
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def _open_cached_media(cache, cache_key: str):
+    """
+    Look up a cached download (runs in a thread).
+
+    Returns (file, etag, content_type, filename, size) with the body as an
+    open file, or None. Metadata and body are separate entries, so a body
+    evicted on its own counts as a miss.
+    """
+    meta = cache.get(cache_key)
+    if meta is None:
+        return None
+    body = cache.get(f'{cache_key}:body', read=True)
+    if body is None:
+        return None
+    return (body,) + tuple(meta)
+
+
+def _store_cached_media(cache, cache_key: str, body, meta: tuple) -> None:
+    """Copy a spooled download into the media cache (runs in a thread)."""
+    cache.set(f'{cache_key}:body', body, read=True)
+    cache.set(cache_key, meta)
+
+
 # =============================================================================
 # HEALTH CHECK SERVER
 # =============================================================================
 
+class ProbeFilteredAccessLogger(AbstractAccessLogger):
+    """Access logger that skips Railway health probes."""
+
+    QUIET_PATHS = frozenset({'/health', '/'})
+
+    def log(self, request, response, time):
+        if request.path in self.QUIET_PATHS:
+            return
+        self.logger.info(
+            '%s %s %s %.3fs', request.method, request.path_qs, response.status, time
+        )
+
+
+def _json(obj, status: int = 200, option: int = 0) -> web.Response:
+    """Build a JSON response with orjson (encodes straight to bytes)."""
+    return web.Response(
+        status=status,
+        body=orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | option),
+        content_type='application/json'
+    )
+
+
 async def health_handler(request):
     """
     Health check endpoint for Railway.
@@ -74,85 +320,77 @@ async def health_handler(request):
 
     Returns 503 if unhealthy (triggers Railway restart).
     """
-    global worker_state
-
     # Check if we're in a healthy state
-    if worker_state['status'] == 'running':
+    if worker_state.status == 'running':
         # Check heartbeat freshness
-        last_heartbeat = worker_state.get('last_heartbeat')
-        if last_heartbeat:
-            heartbeat_age = (datetime.now(timezone.utc) - last_heartbeat).total_seconds()
+        now = time.monotonic()
+        if worker_state.last_heartbeat_mono:
+            heartbeat_age = now - worker_state.last_heartbeat_mono
             if heartbeat_age > 300:  # 5 minutes
-                return web.Response(
-                    status=503,
-                    text=json.dumps({
-                        'status': 'unhealthy',
-                        'reason': f'Heartbeat stale ({heartbeat_age:.0f}s old)',
-                    }),
-                    content_type='application/json'
-                )
+                return _json({
+                    'status': 'unhealthy',
+                    'reason': f'Heartbeat stale ({heartbeat_age:.0f}s old)',
+                }, status=503)
 
-        return web.Response(
-            status=200,
-            text=json.dumps({
+        if now >= _HEALTH_CACHE['expires_at']:
+            _HEALTH_CACHE['bytes'] = orjson.dumps({
                 'status': 'healthy',
-                'uptime': (datetime.now(timezone.utc) - worker_state['started_at']).total_seconds() if worker_state['started_at'] else 0,
-                'messages_received': worker_state['messages_received'],
-            }),
-            content_type='application/json'
-        )
+                'uptime': (_utcnow(_UTC) - worker_state.started_at).total_seconds() if worker_state.started_at else 0,
+                'messages_received': worker_state.messages_received,
+            })
+            _HEALTH_CACHE['expires_at'] = now + HEALTH_CACHE_TTL
+
+        return web.Response(body=_HEALTH_CACHE['bytes'], content_type='application/json')
 
-    elif worker_state['status'] == 'starting':
+    elif worker_state.status == 'starting':
         # Still starting up - return 200 to avoid premature restart
-        return web.Response(
-            status=200,
-            text=json.dumps({
-                'status': 'starting',
-                'message': 'Worker is initializing...',
-            }),
-            content_type='application/json'
-        )
+        return _json({
+            'status': 'starting',
+            'message': 'Worker is initializing...',
+        })
 
     else:
-        return web.Response(
-            status=503,
-            text=json.dumps({
-                'status': 'unhealthy',
-                'worker_status': worker_state['status'],
-                'errors': worker_state['errors'][-5:],
-            }),
-            content_type='application/json'
-        )
+        return _json({
+            'status': 'unhealthy',
+            'worker_status': worker_state.status,
+            'errors': list(worker_state.errors)[-5:],
+        }, status=503)
 
 
 async def status_handler(request):
-    """Detailed status endpoint."""
-    global worker_state
+    """
+    Detailed status endpoint.
 
+    Compact JSON by default; pass ?pretty=1 for indented output.
+    """
     session_info = get_session_info()
 
-    status = {
-        'worker': {
-            'status': worker_state['status'],
-            'started_at': worker_state['started_at'].isoformat() if worker_state['started_at'] else None,
-            'messages_received': worker_state['messages_received'],
-            'last_heartbeat': worker_state['last_heartbeat'].isoformat() if worker_state['last_heartbeat'] else None,
-            'errors': worker_state['errors'][-10:],
-        },
-        'session': session_info,
-        'environment': {
-            'PORT': PORT,
-            'SESSION_PATH': str(SESSION_PATH),
-            'has_database_url': bool(os.getenv('DATABASE_URL')),
-            'has_telegram_credentials': bool(os.getenv('TELEGRAM_API_ID')),
-        }
-    }
-
-    return web.Response(
-        text=json.dumps(status, indent=2, default=str),
-        content_type='application/json'
+    last_heartbeat = None
+    if worker_state.last_heartbeat_mono:
+        # Convert the monotonic stamp back to wall-clock time for display
+        heartbeat_age = time.monotonic() - worker_state.last_heartbeat_mono
+        last_heartbeat = datetime.fromtimestamp(time.time() - heartbeat_age, _UTC).isoformat()
+
+    status = StatusPayload(
+        worker=WorkerStatus(
+            status=worker_state.status,
+            started_at=worker_state.started_at.isoformat() if worker_state.started_at else None,
+            messages_received=worker_state.messages_received,
+            last_heartbeat=last_heartbeat,
+            errors=list(worker_state.errors)[-10:],
+        ),
+        session=session_info,
+        environment=EnvironmentInfo(
+            PORT=PORT,
+            SESSION_PATH=str(SESSION_PATH),
+            has_database_url=bool(os.getenv('DATABASE_URL')),
+            has_telegram_credentials=bool(os.getenv('TELEGRAM_API_ID')),
+        ),
     )
 
+    pretty = request.query.get('pretty') in ('1', 'true')
+    return _json(status, option=orjson.OPT_INDENT_2 if pretty else 0)
+
 
 async def download_handler(request):
     """
@@ -163,130 +401,191 @@ async def download_handler(request):
     - telegram_chat_id: The Telegram chat/channel/user ID
 
     Returns the media file as binary with appropriate Content-Type.
+    Payloads are cached on disk keyed by chat/message ID. The ETag comes
+    from the Telegram media ID, so every response carries it, repeat
+    requests skip Telegram and revalidations get a 304.
     """
-    global worker_state
-
+    response = None
     try:
         # Parse query parameters
         telegram_message_id = request.query.get('telegram_message_id')
         telegram_chat_id = request.query.get('telegram_chat_id')
 
         if not telegram_message_id or not telegram_chat_id:
-            return web.Response(
-                status=400,
-                text=json.dumps({'error': 'Missing telegram_message_id or telegram_chat_id'}),
-                content_type='application/json'
-            )
+            return _json({'error': 'Missing telegram_message_id or telegram_chat_id'}, status=400)
 
         telegram_message_id = int(telegram_message_id)
         telegram_chat_id = int(telegram_chat_id)
 
+        # Serve from the media cache when we already have this file
+        cache = get_media_cache()
+        cache_key = f'{telegram_chat_id}:{telegram_message_id}'
+        cached = await asyncio.to_thread(_open_cached_media, cache, cache_key) if cache is not None else None
+        if cached:
+            body, etag, content_type, filename, size = cached
+            try:
+                headers = {
+                    'ETag': etag,
+                    'Content-Disposition': f'inline; filename="{filename}"',
+                    'Cache-Control': 'public, max-age=86400',  # Cache for 24 hours
+                }
+                if etag_matches(request.headers.get('If-None-Match', ''), etag):
+                    return web.Response(status=304, headers=headers)
+
+                # Stream the cached file rather than reading it into memory
+                response = web.StreamResponse(headers=headers)
+                response.content_type = content_type
+                response.content_length = size
+                await response.prepare(request)
+                while chunk := await asyncio.to_thread(body.read, DOWNLOAD_CHUNK_SIZE):
+                    await response.write(chunk)
+                await response.write_eof()
+                return response
+            finally:
+                body.close()
+
         # Get the listener which has the Telegram client
-        listener = worker_state.get('listener')
+        listener = worker_state.listener
         if not listener or not listener.client:
-            return web.Response(
-                status=503,
-                text=json.dumps({'error': 'Telegram client not ready'}),
-                content_type='application/json'
-            )
+            return _json({'error': 'Telegram client not ready'}, status=503)
 
         # Ensure client is connected
         if not listener.client.is_connected():
-            return web.Response(
-                status=503,
-                text=json.dumps({'error': 'Telegram client not connected'}),
-                content_type='application/json'
-            )
+            return _json({'error': 'Telegram client not connected'}, status=503)
 
         client = listener.client
 
         # Fetch the message from Telegram
         try:
             # Get the entity (chat/user/channel) first
-            entity = await client.get_entity(telegram_chat_id)
+            entity = await resolve_entity(client, telegram_chat_id)
 
             # Get the specific message
             messages = await client.get_messages(entity, ids=telegram_message_id)
             message = messages if not isinstance(messages, list) else (messages[0] if messages else None)
 
-            if not message or not message.media:
-                return web.Response(
-                    status=404,
-                    text=json.dumps({'error': 'Message or media not found'}),
-                    content_type='application/json'
-                )
-
-            # Download the media to memory
-            media_bytes = await client.download_media(message, file=bytes)
+            if not message or not has_media_file(message.media):
+                return _json({'error': 'Message or media not found'}, status=404)
 
-            if not media_bytes:
-                return web.Response(
-                    status=404,
-                    text=json.dumps({'error': 'Failed to download media'}),
-                    content_type='application/json'
-                )
+            # The tag comes from the media ID, so revalidations of uncached
+            # media are answered without downloading anything
+            etag = media_etag(message.media)
+            if etag_matches(request.headers.get('If-None-Match', ''), etag):
+                return web.Response(status=304, headers={
+                    'ETag': etag,
+                    'Cache-Control': 'public, max-age=86400',  # Cache for 24 hours
+                })
 
             # Determine content type and filename
             content_type = 'application/octet-stream'
             filename = f'media_{telegram_message_id}'
 
-            if hasattr(message.media, 'photo'):
+            if isinstance(message.media, MessageMediaPhoto):
                 content_type = 'image/jpeg'
                 filename = f'photo_{telegram_message_id}.jpg'
-            elif hasattr(message.media, 'document'):
+            elif isinstance(message.media, MessageMediaDocument) and message.media.document:
                 doc = message.media.document
-                # Try to get mime type from document
-                if hasattr(doc, 'mime_type') and doc.mime_type:
-                    content_type = doc.mime_type
-                # Try to get filename from attributes
-                if hasattr(doc, 'attributes'):
-                    for attr in doc.attributes:
-                        if hasattr(attr, 'file_name') and attr.file_name:
-                            filename = attr.file_name
-                            break
-
-            log(f"[DOWNLOAD] Served media: chat={telegram_chat_id}, msg={telegram_message_id}, size={len(media_bytes)}")
-
-            return web.Response(
-                body=media_bytes,
-                content_type=content_type,
-                headers={
-                    'Content-Disposition': f'inline; filename="{filename}"',
-                    'Cache-Control': 'public, max-age=86400',  # Cache for 24 hours
-                }
-            )
+                content_type = doc.mime_type or content_type
+                filename = next(
+                    (a.file_name for a in doc.attributes
+                     if isinstance(a, DocumentAttributeFilename) and a.file_name),
+                    filename
+                )
+
+            # Pull the first chunk before sending headers so the real
+            # type can be sniffed from its magic bytes (photos may be
+            # WebP/PNG, documents may lack a mime_type)
+            chunks = client.iter_download(message, chunk_size=DOWNLOAD_CHUNK_SIZE).__aiter__()
+            chunk = await anext(chunks, b'')
+
+            # Nothing to stream (or cache) - fail before any headers go out
+            if not chunk:
+                return _json({'error': 'Failed to download media'}, status=404)
+
+            if filetype is not None and (
+                    isinstance(message.media, MessageMediaPhoto)
+                    or content_type == 'application/octet-stream'):
+                kind = filetype.guess(chunk[:262])
+                if kind is not None:
+                    content_type = kind.mime
+                    if isinstance(message.media, MessageMediaPhoto):
+                        filename = f'photo_{telegram_message_id}.{kind.extension}'
+
+            # Stream the media straight to the client in chunks
+            # (memory stays bounded by DOWNLOAD_CHUNK_SIZE, not the file size)
+            response = web.StreamResponse(headers={
+                'ETag': etag,
+                'Content-Disposition': f'inline; filename="{filename}"',
+                'Cache-Control': 'public, max-age=86400',  # Cache for 24 hours
+            })
+            response.content_type = content_type
+            await response.prepare(request)
+
+            # The cache copy is written as the download streams: small files
+            # stay in memory, larger ones roll over to a temp file
+            size = 0
+            spool = tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_MEMORY) if cache is not None else None
+            try:
+                while chunk:
+                    await response.write(chunk)
+                    size += len(chunk)
+                    if spool is not None:
+                        if size > MEDIA_CACHE_MAX_ITEM:
+                            spool.close()
+                            spool = None  # Too big to cache, keep streaming only
+                        else:
+                            await asyncio.to_thread(spool.write, chunk)
+                    chunk = await anext(chunks, b'')
+                await response.write_eof()
+
+                if spool is not None and size:  # never cache an empty body
+                    spool.seek(0)
+                    try:
+                        await asyncio.to_thread(_store_cached_media, cache, cache_key, spool,
+                                                (etag, content_type, filename, size))
+                    except Exception as e:
+                        log("[DOWNLOAD] Failed to cache media %s: %s", cache_key, e, level='WARN')
+            finally:
+                if spool is not None:
+                    spool.close()
+
+            log("[DOWNLOAD] Served media: chat=%s, msg=%s, size=%d", telegram_chat_id, telegram_message_id, size)
+            return response
 
         except ValueError as e:
-            log(f"[DOWNLOAD] Entity not found: {e}", level='WARN')
-            return web.Response(
-                status=404,
-                text=json.dumps({'error': f'Chat not found: {telegram_chat_id}'}),
-                content_type='application/json'
-            )
+            log("[DOWNLOAD] Entity not found: %s", e, level='WARN')
+            return _json({'error': f'Chat not found: {telegram_chat_id}'}, status=404)
 
     except Exception as e:
-        log(f"[DOWNLOAD] Error: {e}", level='ERROR')
-        return web.Response(
-            status=500,
-            text=json.dumps({'error': str(e)}),
-            content_type='application/json'
-        )
+        log("[DOWNLOAD] Error: %s", e, level='ERROR')
+        if response is not None and response.prepared:
+            # Headers already sent - abort the connection instead of
+            # appending an error body to a partial file
+            raise
+        return _json({'error': str(e)}, status=500)
 
 
 async def start_health_server():
     """Start the HTTP health check server with download endpoint."""
-    app = web.Application(client_max_size=50*1024*1024)  # 50MB max for downloads
+    app = web.Application()
     app.router.add_get('/health', health_handler)
     app.router.add_get('/status', status_handler)
     app.router.add_get('/download', download_handler)  # On-demand media download
     app.router.add_get('/', health_handler)  # Default route
 
-    runner = web.AppRunner(app)
+    runner = web.AppRunner(app, access_log_class=ProbeFilteredAccessLogger)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', PORT)
     await site.start()
-    log(f"Health server started on port {PORT}")
-    log(f"Media download endpoint: /download?telegram_chat_id=X&telegram_message_id=Y")
+    log("Health server started on port %d", PORT)
+    log("Media download endpoint: /download?telegram_chat_id=X&telegram_message_id=Y")
+
+
+def set_status(status: str):
+    """Move the worker to a new status, logging only real transitions."""
+    if worker_state.status != status:
+        log("Worker status: %s -> %s", worker_state.status, status)
+        worker_state.status = status
 
 
 # =============================================================================
@@ -295,25 +594,21 @@ async def start_health_server():
 
 def on_message_received():
     """Called by listener when a message is received."""
-    global worker_state
-    worker_state['messages_received'] += 1
+    worker_state.messages_received += 1
+    worker_state.session_dirty = True  # Telethon updated the session's update state
 
 
 def on_heartbeat():
     """Called by listener on heartbeat."""
-    global worker_state
-    worker_state['last_heartbeat'] = datetime.now(timezone.utc)
+    worker_state.last_heartbeat_mono = time.monotonic()
 
 
 def on_error(error: str):
     """Called by listener on error."""
-    global worker_state
-    worker_state['errors'].append({
+    worker_state.errors.append({
         'error': error,
-        'timestamp': datetime.now(timezone.utc).isoformat()
+        'timestamp': _iso_utcnow()
     })
-    # Keep only last 20 errors
-    worker_state['errors'] = worker_state['errors'][-20:]
 
 
 # =============================================================================
@@ -322,11 +617,6 @@ def on_error(error: str):
 
 async def run_listener():
     """Run the Telegram realtime listener."""
-    global worker_state
-
-    # Import here to avoid issues during health check startup
-    from realtime_listener import RealtimeListener
-
     log("Starting realtime listener...")
 
     listener = RealtimeListener(
@@ -336,41 +626,78 @@ async def run_listener():
         on_error=on_error,
     )
 
-    worker_state['listener'] = listener
-    worker_state['status'] = 'running'
-    worker_state['started_at'] = datetime.now(timezone.utc)
+    worker_state.listener = listener
+    set_status('running')
+    worker_state.started_at = _utcnow(_UTC)
 
     try:
         await listener.start()
     except Exception as e:
-        log(f"Listener error: {e}", level='ERROR')
-        worker_state['status'] = 'error'
+        log("Listener error: %s", e, level='ERROR')
+        set_status('error')
         on_error(str(e))
         raise
 
 
-async def periodic_backup():
-    """Periodically backup the session file."""
-    while True:
-        await asyncio.sleep(3600)  # Every hour
-        try:
-            backup_session()
-            log("Session backed up successfully")
-        except Exception as e:
-            log(f"Session backup failed: {e}", level='WARN')
+def schedule_backup(loop):
+    """Arm the next periodic session backup on the loop's timer heap."""
+    global _backup_timer
+    if SHUTDOWN.is_set():
+        return
+    _backup_timer = loop.call_later(BACKUP_INTERVAL, _run_backup, loop)
+
+
+def _run_backup(loop):
+    """Timer callback: back up a dirty session in the executor, re-arm when done."""
+    now = time.monotonic()
+    if not worker_state.session_dirty or (
+            worker_state.last_backup_mono and now - worker_state.last_backup_mono < BACKUP_MIN_AGE):
+        # Nothing changed, or the last copy is too recent: the session is
+        # dirtied by every message, and each copy rotates out an old backup
+        schedule_backup(loop)
+        return
+    worker_state.session_dirty = False
+    worker_state.last_backup_mono = now
+    future = loop.run_in_executor(_backup_executor, backup_session)
+    future.add_done_callback(lambda f: _backup_done(loop, f))
+
+
+def _backup_done(loop, future):
+    """Log the backup result and schedule the next one."""
+    if future.cancelled():
+        return
+    # backup_session() logs its own errors and reports failure
+    if future.result():
+        log("Session backed up successfully")
+    else:
+        worker_state.session_dirty = True  # Retry on the next tick
+        worker_state.last_backup_mono = 0.0
+    schedule_backup(loop)
 
 
 async def main():
     """Main entry point."""
-    global worker_state
+    log("%s\nPort: %d\nSession path: %s\n", _BANNER, PORT, SESSION_PATH)
+
+    # Deliver signals through the event loop; the handler only sets SHUTDOWN
+    loop = asyncio.get_running_loop()
+    # Default executor: /download cache I/O and listener traceback printing
+    # (session backups run on _backup_executor)
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS))
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, request_shutdown, sig)
+
+    # The shutdown procedure is a supervised sibling of the worker: the
+    # group only exits once both the worker and the final backup are done
+    async with asyncio.TaskGroup() as tg:
+        worker = tg.create_task(run_worker())
+        tg.create_task(graceful_shutdown(worker))
+
+    log("Worker shutting down")
 
-    log("=" * 60)
-    log("  TELEGRAM SYNC WORKER - RAILWAY EDITION")
-    log("=" * 60)
-    log(f"Port: {PORT}")
-    log(f"Session path: {SESSION_PATH}")
-    log("")
 
+async def run_worker():
+    """Health server, startup checks and the supervised listener."""
     # Start health server first (so Railway knows we're alive)
     await start_health_server()
 
@@ -379,92 +706,146 @@ async def main():
     if not restore_session_from_env():
         log("FATAL: Could not restore Telegram session", level='ERROR')
         log("Set TELEGRAM_SESSION_BASE64 environment variable to fix this")
-        worker_state['status'] = 'error'
-        worker_state['errors'].append({
-            'error': 'Session restoration failed',
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        })
-        # Keep the health server running so we can diagnose
-        while True:
-            await asyncio.sleep(60)
-
-    # Validate environment
-    required_vars = ['DATABASE_URL', 'TELEGRAM_API_ID', 'TELEGRAM_API_HASH']
-    missing = [v for v in required_vars if not os.getenv(v)]
+        set_status('error')
+        on_error('Session restoration failed')
+        # Keep the health server running so we can diagnose. /health
+        # reports 503 with the error while we park here; the wait has no
+        # timer, so the loop stays idle until a shutdown signal arrives.
+        await SHUTDOWN.wait()
+        return
+
+    # Validate environment (empty values count as missing)
+    missing = [v for v in REQUIRED_VARS if not os.environ.get(v)]
     if missing:
-        log(f"FATAL: Missing environment variables: {missing}", level='ERROR')
-        worker_state['status'] = 'error'
-        while True:
-            await asyncio.sleep(60)
+        log("FATAL: Missing environment variables: %s", missing, level='ERROR')
+        set_status('error')
+        # Same as above: serve 503s for diagnosis, no periodic wakeups
+        await SHUTDOWN.wait()
+        return
+
+    # Start periodic backups
+    schedule_backup(asyncio.get_running_loop())
 
-    # Start periodic backup task
-    asyncio.create_task(periodic_backup())
+    await supervise_listener()
 
-    # Run the listener (with auto-restart)
+
+async def supervise_listener():
+    """Run the listener, restarting it with backoff until shutdown."""
     retry_count = 0
-    max_retries = 10
+    max_retries = MAX_LISTENER_RETRIES
 
-    while retry_count < max_retries:
+    while retry_count < max_retries and not SHUTDOWN.is_set():
+        run_start = time.monotonic()
         try:
             await run_listener()
+            retry_count = 0  # Clean exit - next failure starts a fresh budget
         except KeyboardInterrupt:
             log("Shutdown requested")
             break
+        except (UnauthorizedError, AuthKeyDuplicatedError) as e:
+            # Restarting can't fix a revoked or duplicated session
+            log("Listener stopped: Telegram session unusable (%s): %s", type(e).__name__, e, level='ERROR')
+            set_status('failed')
+            await SHUTDOWN.wait()
+            break
         except Exception as e:
+            if SHUTDOWN.is_set():
+                break
+            if time.monotonic() - run_start > LISTENER_STABLE_AFTER:
+                retry_count = 0  # It ran fine for a while - treat as a one-off crash
             retry_count += 1
-            log(f"Listener crashed (attempt {retry_count}/{max_retries}): {e}", level='ERROR')
-            worker_state['status'] = 'restarting'
+            log("Listener crashed (attempt %d/%d): %s", retry_count, max_retries, e, level='ERROR')
+            set_status('restarting')
 
             if retry_count < max_retries:
-                wait_time = min(30, 5 * retry_count)  # Exponential backoff, max 30s
-                log(f"Restarting in {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
+                # Jittered exponential backoff (max 30s) so a fleet of workers
+                # restarting together doesn't reconnect to Telegram in lockstep
+                wait_time = _rng.uniform(1, _BACKOFF[retry_count])
+                log("Restarting in %.1f seconds...", wait_time)
+                # A shutdown signal ends the backoff early; timing out means retry
+                try:
+                    await asyncio.wait_for(SHUTDOWN.wait(), wait_time)
+                except asyncio.TimeoutError:
+                    pass
             else:
                 log("Max retries exceeded, giving up", level='ERROR')
-                worker_state['status'] = 'failed'
-                # Exit with error code to trigger Railway restart
-                sys.exit(1)
-
-    log("Worker shutting down")
-
+                set_status('failed')
+                # Save the session before the hard exit below
+                backup_session()
+                # Exit with error code to trigger Railway restart.
+                # os._exit() skips Python finalizers - required because
+                # Telethon's MTProto sender may hold the loop in a socket
+                # read that SystemExit cannot interrupt cleanly.
+                os._exit(1)
+
+    # Left the loop without a signal (e.g. KeyboardInterrupt) - still
+    # run the graceful shutdown so the group can finish
+    request_shutdown()
+
+
+def request_shutdown(signum: Optional[int] = None):
+    """Signal handler (runs on the event loop): start the graceful shutdown."""
+    if SHUTDOWN.is_set():
+        return  # Already shutting down (repeated signal)
+    if signum is not None:
+        log("Received signal %s, initiating graceful shutdown...", signal.Signals(signum).name)
+    SHUTDOWN.set()
+
+
+async def graceful_shutdown(worker_task: Optional[asyncio.Task] = None):
+    """
+    Graceful shutdown procedure.
 
-def signal_handler(signum, frame):
-    """Handle shutdown signals."""
-    log(f"Received signal {signum}, initiating graceful shutdown...")
+    Runs inside main()'s TaskGroup and waits for SHUTDOWN; then stops the
+    listener, cancels the backup timer, takes a final session backup and
+    gives worker_task (which supervises the listener) a moment to finish.
+    """
+    await SHUTDOWN.wait()
+    log("Starting graceful shutdown...")
 
     # If we have a listener, trigger its shutdown
-    if worker_state.get('listener'):
-        worker_state['listener'].request_shutdown()
+    if worker_state.listener:
+        worker_state.listener.request_shutdown()
 
-    # Create a task to cleanly exit
-    asyncio.create_task(graceful_shutdown())
+    # No more periodic backups - the final one below replaces them
+    if _backup_timer is not None:
+        _backup_timer.cancel()
 
+    set_status('stopping')
 
-async def graceful_shutdown():
-    """Graceful shutdown procedure."""
-    global worker_state
-
-    log("Starting graceful shutdown...")
-    worker_state['status'] = 'stopping'
-
-    # Backup session before exit
-    try:
-        backup_session()
-        log("Final session backup completed")
-    except Exception as e:
-        log(f"Final backup failed: {e}", level='WARN')
-
-    # Give tasks a moment to finish
-    await asyncio.sleep(2)
+    # Backup session before exit (only if it changed since the last backup)
+    if worker_state.session_dirty:
+        try:
+            # Bounded so a wedged disk can't block termination indefinitely
+            if await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(_backup_executor, backup_session),
+                timeout=SHUTDOWN_BACKUP_TIMEOUT,
+            ):
+                worker_state.session_dirty = False
+                log("Final session backup completed")
+        except asyncio.TimeoutError:
+            log("Final backup timed out after %ss", SHUTDOWN_BACKUP_TIMEOUT, level='WARN')
+
+    # Give the worker (and the listener loops under it) up to 2s to
+    # finish, returning as soon as it does. Only our own task is touched:
+    # Telethon's internal tasks and in-flight HTTP handlers belong to
+    # their owners, which shut them down themselves.
+    if worker_task is not None and not worker_task.done():
+        _, still_running = await asyncio.wait({worker_task}, timeout=2.0)
+        if still_running:
+            worker_task.cancel()
 
     log("Shutdown complete")
-    sys.exit(0)
 
 
 if __name__ == '__main__':
-    # Setup signal handlers
-    signal.signal(signal.SIGTERM, signal_handler)
-    signal.signal(signal.SIGINT, signal_handler)
-
-    # Run the main async loop
-    asyncio.run(main())
+    # Prefer uvloop's libuv event loop when available
+    try:
+        import uvloop
+        loop_factory = uvloop.new_event_loop
+    except ImportError:
+        loop_factory = None
+
+    # Run the main async loop (signal handlers are installed inside main)
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(main())
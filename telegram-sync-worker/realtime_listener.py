@@ -19,14 +19,27 @@ import os
 import io
 import base64
 import asyncio
+import functools
 import hashlib
+import random
+from collections import OrderedDict, deque
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List, Callable
+from typing import Optional, Dict, Any, List, Callable, Deque
+import sys
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
 
+import orjson
 import psycopg2
-from psycopg2.extras import Json
+from cachetools import TTLCache
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from telethon import TelegramClient, events
+from telethon.errors import FloodWaitError
 from telethon.tl.types import (
     Message, PeerUser, PeerChat, PeerChannel,
     MessageMediaPhoto, MessageMediaDocument,
@@ -38,7 +51,9 @@ from telethon.tl.types import (
     UpdateDialogUnreadMark
 )
 
-from lock_manager import SyncLockManager, ListenerStateManager
+from lock_manager import (
+    SyncLockManager, ListenerStateManager, PreparingConnection, execute_prepared,
+)
 
 
 # Configuration from environment
@@ -49,20 +64,46 @@ if '?schema=' in DATABASE_URL:
 API_ID = int(os.getenv('TELEGRAM_API_ID', '0'))
 API_HASH = os.getenv('TELEGRAM_API_HASH', '')
 
+# Connection pool for message writes (one executor thread per connection)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '4'))
+
+# Conversation lookup cache: bounded LRU with TTL so renamed chats refresh
+CONVERSATION_CACHE_SIZE = 4096
+CONVERSATION_CACHE_TTL = 3600  # seconds
+
+# Sender -> contact lookup cache (the same few senders repeat in every chat)
+CONTACT_CACHE_SIZE = 10_000
+CONTACT_CACHE_TTL = 1800  # seconds
+
 # Sync settings
 HEARTBEAT_INTERVAL = 30  # seconds
+CALLBACK_MAX_PENDING = 100  # Outstanding async callback tasks before the oldest is dropped
+HEARTBEAT_MAX_INTERVAL = HEARTBEAT_INTERVAL * 3  # Idle backoff cap (the dashboard flags heartbeats older than 120s)
+LOCK_TTL = SyncLockManager.LOCK_DURATIONS['listener'].total_seconds()  # SyncLock row lease; renewed at half-life
+STATE_QUEUE_SIZE = 1000  # Pending state writes before dropping
+MESSAGE_QUEUE_SIZE = 4096  # Pending messages before producers wait
+PROCESSOR_BATCH_SIZE = 64  # Queued messages the processor inserts per statement
+PROCESSED_IDS_SIZE = 10_000  # Recently written message keys kept for in-memory dedup
+CONVERSATION_FLUSH_WINDOW = 0.2  # seconds new-message conversation bumps are coalesced for
+USER_STATUS_FLUSH_WINDOW = 1.0  # seconds contact online-status updates are coalesced for
+ERROR_HISTORY_SIZE = 200  # Errors kept in memory
+TRACEBACK_BUFFER_SIZE = 100  # Tracebacks held between heartbeats before the oldest are dropped
+STATE_ERRORS = 10  # Most recent errors sent with each state write
 CATCH_UP_LIMIT = 200  # Max messages per conversation on startup
 CATCH_UP_CONVERSATIONS = 50  # Max conversations to catch up
+CATCH_UP_CONCURRENCY = 5  # Conversations fetched from Telegram in parallel
 
 # 100x RELIABLE: Active polling backup (belt + suspenders approach)
 # Events can fail silently - polling is the guaranteed backup
 ACTIVE_POLL_INTERVAL = int(os.getenv('ACTIVE_POLL_INTERVAL', '120'))  # Poll every 2 minutes
+ACTIVE_POLL_INTERVAL_MAX = int(os.getenv('ACTIVE_POLL_INTERVAL_MAX', '960'))  # Backoff cap after flood waits
 ACTIVE_POLL_CONVERSATIONS = 100  # Top 100 most active conversations (increased from 30)
 ACTIVE_POLL_MESSAGES_PER_CONV = 10  # Check last 10 messages per conversation
 
 # Full catch-up sync - ensures ALL conversations are synced periodically
 # This catches conversations that aren't in the top 100 by activity
 FULL_CATCHUP_INTERVAL = int(os.getenv('FULL_CATCHUP_INTERVAL', '900'))  # Every 15 minutes
+FULL_CATCHUP_INTERVAL_MAX = int(os.getenv('FULL_CATCHUP_INTERVAL_MAX', '3600'))  # Backoff cap after flood waits
 FULL_CATCHUP_CONVERSATIONS = 200  # Sync up to 200 conversations in full catch-up
 
 # 100x Reliable Sync - Dialog Discovery
@@ -79,16 +120,261 @@ DOWNLOAD_PHOTOS_INLINE = True
 PHOTO_DOWNLOAD_TIMEOUT = 15  # seconds
 MAX_PHOTO_SIZE_BYTES = 5 * 1024 * 1024  # 5MB max for base64 storage
 
+# Telegram user status type -> (isOnline, onlineStatus, attribute holding lastSeenAt)
+USER_STATUS_VALUES = {
+    UserStatusOnline: (True, 'online', None),
+    UserStatusOffline: (False, 'offline', 'was_online'),
+    UserStatusRecently: (False, 'recently', None),
+    UserStatusLastWeek: (False, 'last_week', None),
+    UserStatusLastMonth: (False, 'last_month', None),
+}
+UNKNOWN_USER_STATUS = (False, 'unknown', None)
+
+# Queued by request_shutdown() to wake the idle message processor
+_STOP = object()
+
+
+# ============================================================================
+# HOT-PATH SQL
+# ============================================================================
+# Built once at import instead of on every call; also keeps the per-message
+# statements (and their placeholder counts) in one place. Statements run
+# through execute_prepared() use $n placeholders.
+
+INSERT_MESSAGE_SQL = """
+    INSERT INTO telegram_crm."Message" (
+        id, "conversationId", "contactId", source, "externalMessageId",
+        direction, "contentType", body, "sentAt", status,
+        "hasAttachments", attachments, metadata, "createdAt"
+    )
+    VALUES ($1, $2, $3, 'telegram', $4, $5, $6, $7, $8, $9, $10, $11, $12, NOW())
+    ON CONFLICT (source, "conversationId", "externalMessageId") DO NOTHING
+"""
+
+# Applies a flush window's worth of conversation bumps in one statement
+# (execute_values fills the VALUES list: id, latest sentAt, highest
+# external message id, inbound count)
+UPDATE_CONVERSATIONS_SQL = """
+    UPDATE telegram_crm."Conversation" c
+    SET "lastMessageAt" = GREATEST(c."lastMessageAt", v.sent_at),
+        "lastSyncedMessageId" = GREATEST(
+            COALESCE(c."lastSyncedMessageId", '0')::bigint,
+            v.external_id
+        )::text,
+        "lastSyncedAt" = NOW(),
+        "unreadCount" = c."unreadCount" + v.inbound,
+        "updatedAt" = NOW()
+    FROM (VALUES %s) AS v(id, sent_at, external_id, inbound)
+    WHERE c.id = v.id
+      -- Skip the write (and its WAL/index churn) when nothing would change:
+      -- older outbound messages move neither pointer nor unreadCount
+      AND (
+          v.inbound > 0
+          OR c."lastMessageAt" IS NULL
+          OR c."lastMessageAt" < v.sent_at
+          OR COALESCE(c."lastSyncedMessageId", '0')::bigint < v.external_id
+      )
+"""
+
+INSERT_MESSAGE_BATCH_SQL = """
+    INSERT INTO telegram_crm."Message" (
+        id, "conversationId", "contactId", source, "externalMessageId",
+        direction, "contentType", body, "sentAt", status,
+        "hasAttachments", attachments, metadata, "createdAt"
+    )
+    VALUES %s
+    ON CONFLICT (source, "conversationId", "externalMessageId") DO NOTHING
+"""
+
+INSERT_MESSAGES_RETURNING_SQL = INSERT_MESSAGE_BATCH_SQL + """
+    RETURNING "conversationId", "externalMessageId"
+"""
+
+UPDATE_CHECKPOINT_SQL = """
+    UPDATE telegram_crm."Conversation"
+    SET "lastSyncedMessageId" = %s,
+        "lastSyncedAt" = NOW(),
+        "lastMessageAt" = GREATEST("lastMessageAt", %s),
+        "unreadCount" = "unreadCount" + %s,
+        "updatedAt" = NOW()
+    WHERE id = %s
+"""
+
+# Latest status per Telegram user for a flush window (execute_values fills
+# the VALUES list); lastSeenAt is only known for offline users
+UPDATE_USER_STATUSES_SQL = """
+    UPDATE telegram_crm."Contact" c
+    SET "isOnline" = v.is_online,
+        "onlineStatus" = v.online_status,
+        "lastSeenAt" = COALESCE(v.last_seen_at, c."lastSeenAt"),
+        "lastStatusCheck" = NOW(),
+        "updatedAt" = NOW()
+    FROM telegram_crm."SourceIdentity" si,
+         (VALUES %s) AS v(external_id, is_online, online_status, last_seen_at)
+    WHERE si."contactId" = c.id
+      AND si.source = 'telegram'
+      AND si."externalId" = v.external_id
+    RETURNING v.external_id, v.is_online
+"""
+
+SELECT_CONVERSATION_SQL = """
+    SELECT id, title, type, "isSyncDisabled"
+    FROM telegram_crm."Conversation"
+    WHERE "externalChatId" = $1 AND source = 'telegram'
+"""
+
+SELECT_EXISTING_MESSAGE_IDS_SQL = """
+    SELECT "externalMessageId"
+    FROM telegram_crm."Message"
+    WHERE source = 'telegram'
+      AND "conversationId" = %s
+      AND "externalMessageId" = ANY(%s)
+"""
+
+SELECT_CONVERSATIONS_SQL = """
+    SELECT "externalChatId", id, title, type, "isSyncDisabled"
+    FROM telegram_crm."Conversation"
+    WHERE "externalChatId" = ANY(%s) AND source = 'telegram'
+"""
+
+SELECT_CONTACT_SQL = """
+    SELECT c.id
+    FROM telegram_crm."Contact" c
+    JOIN telegram_crm."SourceIdentity" si ON si."contactId" = c.id
+    WHERE si.source = 'telegram' AND si."externalId" = $1
+    LIMIT 1
+"""
+
+SELECT_CONTACTS_SQL = """
+    SELECT DISTINCT ON (si."externalId") si."externalId", c.id
+    FROM telegram_crm."Contact" c
+    JOIN telegram_crm."SourceIdentity" si ON si."contactId" = c.id
+    WHERE si.source = 'telegram' AND si."externalId" = ANY(%s)
+"""
+
+
+# Minimum level log() prints (LOG_LEVEL env var, same as the worker)
+_LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARN': 30, 'ERROR': 40}
+_MIN_LOG_LEVEL = _LOG_LEVELS.get(os.getenv('LOG_LEVEL', 'INFO').upper(), 20)
+
+# log() timestamp, reformatted at most once per second
+_log_second = -1
+_log_stamp = ''
+
+
+def log(message: str, *args, level: str = 'INFO'):
+    """
+    Simple logging with timestamp.
+
+    Extra positional args are %-formatted into message only after the
+    LOG_LEVEL check, so filtered-out calls skip string formatting.
+    """
+    global _log_second, _log_stamp
+    if _LOG_LEVELS.get(level, 20) < _MIN_LOG_LEVEL:
+        return
+    if args:
+        message = message % args
+    now = int(time.time())
+    if now != _log_second:
+        lt = time.localtime(now)
+        _log_stamp = (
+            f"{lt.tm_year:04d}-{lt.tm_mon:02d}-{lt.tm_mday:02d} "
+            f"{lt.tm_hour:02d}:{lt.tm_min:02d}:{lt.tm_sec:02d}"
+        )
+        _log_second = now
+    print(f"[{_log_stamp}] [{level}] {message}")
+
+
+# Error timestamp, reformatted at most once per second
+_iso_second = -1
+_iso_stamp = ''
+
+
+def utc_iso(ts: float) -> str:
+    """Unix timestamp as a UTC ISO-8601 string."""
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def utc_iso_now() -> str:
+    """Current UTC time as an ISO-8601 string, to the second (cached per second)."""
+    global _iso_second, _iso_stamp
+    now = int(time.time())
+    if now != _iso_second:
+        _iso_stamp = utc_iso(now)
+        _iso_second = now
+    return _iso_stamp
+
+
+@functools.lru_cache(maxsize=256)
+def canonical_error(error: str) -> str:
+    """
+    Shared copy of an error string.
+
+    Reconnect storms repeat the same few messages; the error ring then
+    holds references to one object each instead of thousands of copies.
+    """
+    return sys.intern(error)
+
+
+def jittered(seconds: float) -> float:
+    """seconds +/-10%, so periodic Telegram polls don't line up across restarts/workers."""
+    return seconds * (0.9 + 0.2 * random.random())
 
-def log(message: str, level: str = 'INFO'):
-    """Simple logging with timestamp."""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print(f"[{timestamp}] [{level}] {message}")
+
+def as_json(obj) -> Json:
+    """
+    Wrap a value for a json/jsonb parameter, serialized with orjson.
+
+    Attachments can carry base64 photo data URLs (up to MAX_PHOTO_SIZE_BYTES),
+    where stdlib json.dumps is the slow part of the insert.
+    """
+    return Json(obj, dumps=_orjson_dumps)
+
+
+def _orjson_dumps(obj) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def chat_info(entity) -> tuple:
+    """(chat_type, title, username) for a Telegram User/Chat/Channel entity."""
+    if isinstance(entity, User):
+        parts = [entity.first_name, entity.last_name]
+        return 'private', ' '.join(filter(None, parts)) or 'Unknown User', entity.username
+    if isinstance(entity, Chat):
+        return 'group', entity.title or 'Unknown Group', None
+    if isinstance(entity, Channel):
+        chat_type = 'supergroup' if entity.megagroup else 'channel'
+        return chat_type, entity.title or 'Unknown Channel', entity.username
+    return 'private', 'Unknown', None
+
+
+def make_id(prefix: str, key: str) -> str:
+    """Deterministic 25-char row ID: prefix + 12-byte BLAKE2b digest of key."""
+    return prefix + hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
 
 
 class RealtimeListener:
     """Persistent Telegram listener with automatic recovery for Railway."""
 
+    # Fixed attribute layout: no per-instance __dict__, and the hot paths
+    # (message processing, heartbeat, state writes) read slots directly.
+    # New attributes must be added here.
+    __slots__ = (
+        'session_path', 'on_message_callback', 'on_heartbeat_callback',
+        'on_error_callback', '_loop', '_callback_tasks',
+        'client', 'conn', '_lock_conn', '_state_conn', '_pool', '_db_executor', '_state_executor',
+        'lock_manager', 'state_manager', '_process_id',
+        'running', 'messages_received', 'started_at', '_error_times', '_error_messages',
+        '_state_errors_json', '_pending_tracebacks', '_tracebacks_dropped',
+        '_shutdown_requested', '_shutdown_event',
+        '_conversation_cache', '_contact_cache', '_contact_cache_lock',
+        '_message_queue', '_queued_message_ids', '_processed_message_ids',
+        '_pending_conversation_updates', '_conversation_updates_event',
+        '_pending_user_statuses', '_user_statuses_event',
+        '_state_queue', '_state_dropped', '_state_writer_active',
+        '_last_state_key', '_lock_renewed_at', '_activity_event',
+    )
+
     def __init__(
         self,
         session_path: str,
@@ -109,28 +395,88 @@ class RealtimeListener:
         self.on_message_callback = on_message
         self.on_heartbeat_callback = on_heartbeat
         self.on_error_callback = on_error
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._callback_tasks: Deque[asyncio.Task] = deque()
 
         self.client: Optional[TelegramClient] = None
         self.conn = None
+        # Holds the singleton advisory lock and nothing else, so no error
+        # or rollback on a working connection can drop the lock
+        self._lock_conn = None
+        # Lock/state manager connection, only ever used on the state thread
+        self._state_conn = None
+        # Message writes check out pooled connections on executor threads,
+        # so blocking psycopg2 I/O stays off the event loop and concurrent
+        # writers (processor, catch-up) don't serialize on one socket
+        self._pool: Optional[ThreadedConnectionPool] = None
+        self._db_executor: Optional[ThreadPoolExecutor] = None
+        self._state_executor: Optional[ThreadPoolExecutor] = None
         self.lock_manager: Optional[SyncLockManager] = None
         self.state_manager: Optional[ListenerStateManager] = None
         self.running = False
         self.messages_received = 0
         self.started_at: Optional[datetime] = None
-        self.errors: List[Dict] = []
+        # Recent errors only (long-running worker), as parallel columns;
+        # the {'error', 'timestamp'} dicts are only built for the state write
+        self._error_times: Deque[int] = deque(maxlen=ERROR_HISTORY_SIZE)
+        self._error_messages: Deque[str] = deque(maxlen=ERROR_HISTORY_SIZE)
+        self._state_errors_json: Optional[str] = None  # Serialized _state_errors(), rebuilt per error
+        # Tracebacks waiting to be printed by the next heartbeat
+        self._pending_tracebacks: Deque[BaseException] = deque(maxlen=TRACEBACK_BUFFER_SIZE)
+        self._tracebacks_dropped = 0
 
         # Graceful shutdown
         self._shutdown_requested = False
         self._shutdown_event = asyncio.Event()
 
-        # Cache conversation lookups
-        self._conversation_cache: Dict[str, Optional[Dict]] = {}
+        # Cache conversation lookups (bounded - unknown/spam chats used to accumulate forever)
+        self._conversation_cache: TTLCache = TTLCache(
+            maxsize=CONVERSATION_CACHE_SIZE, ttl=CONVERSATION_CACHE_TTL
+        )
+
+        # Cache sender contact lookups (None for unknown senders too).
+        # Read from the DB threads, so guarded by a lock.
+        self._contact_cache: TTLCache = TTLCache(
+            maxsize=CONTACT_CACHE_SIZE, ttl=CONTACT_CACHE_TTL
+        )
+        self._contact_cache_lock = threading.Lock()
 
         # 100x RELIABLE: Message processing queue
         # All message sources (events, polling, catch-up) feed into this queue
         # Single processor ensures no conflicts, no duplicates, no race conditions
-        self._message_queue: asyncio.Queue = asyncio.Queue()
-        self._processed_message_ids: set = set()  # In-memory dedup for current session
+        # Bounded so a catch-up burst applies backpressure instead of growing
+        # without limit; keys already waiting in the queue aren't queued twice
+        self._message_queue: asyncio.Queue = asyncio.Queue(maxsize=MESSAGE_QUEUE_SIZE)
+        self._queued_message_ids: set = set()
+
+        # New messages bump their conversation (lastMessageAt, checkpoint,
+        # unreadCount) through a short coalescing window: a burst for one
+        # chat becomes one UPDATE, and a window's chats share one statement.
+        # conversation id -> [latest sentAt, highest external id, inbound count]
+        self._pending_conversation_updates: Dict[str, list] = {}
+        self._conversation_updates_event = asyncio.Event()
+
+        # Contact online-status updates, latest per Telegram user id:
+        # user id -> (isOnline, onlineStatus, lastSeenAt)
+        self._pending_user_statuses: Dict[str, tuple] = {}
+        self._user_statuses_event = asyncio.Event()
+        # In-memory dedup for current session: insertion-ordered, so the
+        # oldest keys are evicted one at a time once PROCESSED_IDS_SIZE is hit
+        self._processed_message_ids: OrderedDict = OrderedDict()
+
+        # State bookkeeping (message counts, status, errors) is drained to
+        # the DB off the event loop; if the DB falls behind, updates are
+        # dropped rather than stalling message delivery
+        self._state_queue: asyncio.Queue = asyncio.Queue(maxsize=STATE_QUEUE_SIZE)
+        self._state_dropped = 0
+        self._state_writer_active = False
+        self._last_state_key = None  # (status, messages, errors) last written
+
+        # Monotonic time the SyncLock row lease was last extended
+        self._lock_renewed_at = 0.0
+
+        # Set on every new message so an idle-backed-off heartbeat snaps back
+        self._activity_event = asyncio.Event()
 
         # Unique process ID for distributed locking in outbox processor
         import uuid
@@ -140,6 +486,12 @@ class RealtimeListener:
         """Request a graceful shutdown."""
         self._shutdown_requested = True
         self._shutdown_event.set()
+        # Wake the processor if it's idle on the queue (if the queue is full
+        # it isn't waiting, and sees _shutdown_requested on its next pass)
+        try:
+            self._message_queue.put_nowait(_STOP)
+        except asyncio.QueueFull:
+            pass
 
     async def start(self):
         """Start the listener with all recovery mechanisms."""
@@ -150,76 +502,136 @@ class RealtimeListener:
         log(f"Session path: {self.session_path}")
         log("")
 
-        # Connect to database
-        log("Connecting to database...")
-        self.conn = psycopg2.connect(DATABASE_URL)
-        self.lock_manager = SyncLockManager(self.conn)
-        self.state_manager = ListenerStateManager(self.conn)
-
-        # Try to acquire listener lock
-        log("Acquiring listener lock...")
-        if not self.lock_manager.acquire('listener', 'singleton'):
-            existing = self.lock_manager.check_lock('listener', 'singleton')
-            if existing:
-                error_msg = (f"Another listener is running on {existing['hostname']}, "
-                           f"PID {existing['process_id']}")
-                log(f"ERROR: {error_msg}", level='ERROR')
+        # Everything from here on is torn down by stop(), including after a
+        # failed start: a leaked lock connection would keep the singleton
+        # advisory lock and fail every in-process restart
+        try:
+            # Connect to database
+            log("Connecting to database...")
+            self.conn = psycopg2.connect(DATABASE_URL, connection_factory=PreparingConnection)
+            self._pool = ThreadedConnectionPool(
+                1, DB_POOL_SIZE, DATABASE_URL, connection_factory=PreparingConnection
+            )
+            self._db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix='listener-db')
+            # Lock/state managers get their own connection, touched only by one
+            # thread, so their commits/rollbacks never interleave with self.conn
+            self._state_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='listener-state')
+
+            # Try to acquire listener lock. The advisory lock is held by a
+            # dedicated connection for the listener's lifetime and dies with it,
+            # so a crashed listener can never block a redeploy.
+            log("Acquiring listener lock...")
+            self._lock_conn = psycopg2.connect(DATABASE_URL)
+            self._lock_conn.autocommit = True
+            singleton = SyncLockManager(self._lock_conn)
+            if not singleton.try_advisory_lock('listener', 'singleton'):
+                holder = singleton.advisory_lock_holder('listener', 'singleton')
+                error_msg = "Another listener is running"
+                if holder:
+                    error_msg += (f" (client {holder['client_addr']}, "
+                                  f"backend PID {holder['pid']})")
+                log("ERROR: %s", error_msg, level='ERROR')
                 self._add_error(error_msg)
                 raise RuntimeError(error_msg)
 
-        log("Acquired listener lock")
-
-        # Connect to Telegram
-        log("Connecting to Telegram...")
-        self.client = TelegramClient(self.session_path, API_ID, API_HASH)
-        await self.client.start()
-
-        if not await self.client.is_user_authorized():
-            error_msg = "Telegram session not authorized"
-            log(f"ERROR: {error_msg}", level='ERROR')
-            self._add_error(error_msg)
-            raise RuntimeError(error_msg)
-
-        me = await self.client.get_me()
-        log(f"Connected to Telegram as: {me.first_name} (@{me.username})")
+            # The managers only exist once we own the singleton, so stop() never
+            # releases locks or writes state on behalf of another listener
+            self._state_conn = psycopg2.connect(DATABASE_URL, connection_factory=PreparingConnection)
+            self.lock_manager = SyncLockManager(self._state_conn)
+            self.state_manager = ListenerStateManager(self._state_conn)
 
-        # Update state
-        self.running = True
-        self.started_at = datetime.now(timezone.utc)
-        self._update_state('running')
+            # We own the singleton, so any SyncLock row left behind is stale.
+            # Keep publishing the row - sync scripts check it to avoid overlap.
+            await self._run_state(self.lock_manager.force_release, 'listener', 'singleton')
+            await self._run_state(self.lock_manager.acquire, 'listener', 'singleton')
+            self._lock_renewed_at = time.monotonic()
 
-        # Run catch-up sync for existing conversations with messages
-        await self._catch_up_sync()
+            log("Acquired listener lock")
 
-        # CRITICAL: Sync messages for conversations with 0 messages
-        # These are conversations created by discovery but never had messages synced
-        await self._sync_empty_conversations()
+            # Connect to Telegram
+            log("Connecting to Telegram...")
+            self.client = TelegramClient(self.session_path, API_ID, API_HASH)
+            await self.client.start()
 
-        # Register event handlers
-        self._register_handlers()
-
-        # 100x RELIABLE: Start single message processor
-        # All sources (events, polling) feed into queue, single processor handles
-        asyncio.create_task(self._message_processor())
-
-        # Start heartbeat task
-        asyncio.create_task(self._heartbeat_loop())
-
-        # 100x RELIABLE SYNC: Start periodic dialog discovery
-        asyncio.create_task(self._dialog_discovery_loop())
-
-        # 100x RELIABLE SYNC: Start active polling backup
-        # This is the GUARANTEED backup - events can fail, polling never does
-        asyncio.create_task(self._active_poll_loop())
+            if not await self.client.is_user_authorized():
+                error_msg = "Telegram session not authorized"
+                log("ERROR: %s", error_msg, level='ERROR')
+                self._add_error(error_msg)
+                raise RuntimeError(error_msg)
 
-        # 100x RELIABLE SYNC: Start full catch-up loop
-        # Ensures ALL conversations are synced periodically, not just the top N
-        asyncio.create_task(self._full_catchup_loop())
+            me = await self.client.get_me()
+            log(f"Connected to Telegram as: {me.first_name} (@{me.username})")
 
-        # LINEAR-STYLE OUTBOX: Start outgoing message processor
-        # Picks up pending messages from OutgoingMessage table and sends via Telegram
-        asyncio.create_task(self._outgoing_message_loop())
+            # Update state
+            self.running = True
+            self._loop = asyncio.get_running_loop()
+
+            # Python 3.12+: tasks run eagerly up to their first await, so the
+            # many callback/handler tasks that finish without suspending skip
+            # a trip through the ready queue. Leave any existing factory alone.
+            if hasattr(asyncio, 'eager_task_factory') and self._loop.get_task_factory() is None:
+                self._loop.set_task_factory(asyncio.eager_task_factory)
+            self.started_at = datetime.now(timezone.utc)
+            self._update_state('running')
+
+            # Run catch-up sync for existing conversations with messages
+            await self._catch_up_sync()
+
+            # CRITICAL: Sync messages for conversations with 0 messages
+            # These are conversations created by discovery but never had messages synced
+            await self._sync_empty_conversations()
+
+            # Register event handlers
+            self._register_handlers()
+
+            # Background loops share one TaskGroup: a crash in any of them
+            # cancels the rest and surfaces from start() (the worker restarts
+            # the listener) instead of dying silently, and shutdown joins
+            # them before cleanup.
+            async with asyncio.TaskGroup() as tg:
+                background = [
+                    # 100x RELIABLE: Start single message processor
+                    # All sources (events, polling) feed into queue, single processor handles
+                    tg.create_task(self._message_processor()),
+
+                    # Start heartbeat + periodic dialog discovery (one timer)
+                    tg.create_task(self._periodic_loop()),
+
+                    # Drain queued state/count/error writes to the DB
+                    tg.create_task(self._state_writer()),
+
+                    # Apply coalesced conversation bumps for new messages
+                    tg.create_task(self._conversation_flush_loop()),
+
+                    # Apply coalesced contact online-status updates
+                    tg.create_task(self._user_status_flush_loop()),
+
+                    # 100x RELIABLE SYNC: Start active polling backup
+                    # This is the GUARANTEED backup - events can fail, polling never does
+                    tg.create_task(self._active_poll_loop()),
+
+                    # 100x RELIABLE SYNC: Start full catch-up loop
+                    # Ensures ALL conversations are synced periodically, not just the top N
+                    tg.create_task(self._full_catchup_loop()),
+
+                    # LINEAR-STYLE OUTBOX: Start outgoing message processor
+                    # Picks up pending messages from OutgoingMessage table and sends via Telegram
+                    tg.create_task(self._outgoing_message_loop()),
+                ]
+
+                self._log_configuration()
+                log("Listening for new messages...")
+
+                # Run until shutdown, then tear the loops down together
+                await self._shutdown_event.wait()
+                for task in background:
+                    task.cancel()
+        finally:
+            # Cleanup (safe after a partial start)
+            await self.stop()
 
+    def _log_configuration(self):
+        """Log the reliability settings this listener runs with."""
         log("")
         log("=" * 60)
         log("  100x RELIABLE SYNC CONFIGURATION")
@@ -234,13 +646,6 @@ class RealtimeListener:
         log(f"  Catch-up limit: {CATCH_UP_LIMIT} messages per conversation")
         log("=" * 60)
         log("")
-        log("Listening for new messages...")
-
-        # Run until shutdown
-        await self._shutdown_event.wait()
-
-        # Cleanup
-        await self.stop()
 
     async def stop(self):
         """Graceful shutdown."""
@@ -250,12 +655,13 @@ class RealtimeListener:
 
         if self.lock_manager:
             try:
-                self.lock_manager.release_all()
+                await self._run_state(self.lock_manager.release_all)
                 log("Released all locks")
             except:
                 pass
 
-        self._update_state('stopped')
+        if self.state_manager:
+            self._update_state('stopped')
 
         if self.client:
             try:
@@ -264,6 +670,18 @@ class RealtimeListener:
             except:
                 pass
 
+        if self._db_executor:
+            self._db_executor.shutdown(wait=True)
+
+        if self._state_executor:
+            self._state_executor.shutdown(wait=True)
+
+        if self._pool:
+            try:
+                self._pool.closeall()
+            except:
+                pass
+
         if self.conn:
             try:
                 self.conn.close()
@@ -271,75 +689,66 @@ class RealtimeListener:
             except:
                 pass
 
+        if self._state_conn:
+            try:
+                self._state_conn.close()
+            except:
+                pass
+
+        # Closing the lock connection is what releases the singleton
+        if self._lock_conn:
+            try:
+                self._lock_conn.close()
+            except:
+                pass
+
+        # Later callbacks (after the loop is gone) run inline again
+        self._loop = None
+
+        for exc in self._pending_tracebacks:
+            traceback.print_exception(exc)
+        self._pending_tracebacks.clear()
+
         log("Shutdown complete")
 
     def _register_handlers(self):
-        """Register Telegram event handlers."""
+        """
+        Register Telegram event handlers.
+
+        Handlers sit on Telethon's dispatch path, so they stay tiny: message
+        events only enqueue for the central processor (which owns message
+        error handling), and the read/status/unread-mark handlers are
+        registered directly - each already catches its own errors.
+        """
+        enqueue = self._enqueue_message
+        add_error = self._add_error
 
         @self.client.on(events.NewMessage)
         async def on_new_message(event):
             """Handle incoming messages in real-time - enqueue for processing."""
             try:
-                # Enqueue message for central processor (no direct processing)
-                await self._enqueue_message(event.message, source='event')
+                await enqueue(event.message, 'event')
             except Exception as e:
-                self._add_error(f"Error enqueuing message: {e}")
-                traceback.print_exc()
+                add_error(f"Error enqueuing message: {e}")
 
         @self.client.on(events.MessageEdited)
         async def on_message_edited(event):
             """Handle edited messages - enqueue for processing."""
             try:
-                await self._enqueue_message(event.message, source='event_edit')
+                await enqueue(event.message, 'event_edit')
             except Exception as e:
-                self._add_error(f"Error enqueuing edit: {e}")
+                add_error(f"Error enqueuing edit: {e}")
 
-        @self.client.on(events.MessageRead)
-        async def on_message_read(event):
-            """
-            Handle read receipts from Telegram.
+        # Read receipts: sync Telegram's actual read state to unreadCount
+        self.client.add_event_handler(self._handle_read_event, events.MessageRead)
 
-            Syncs read state from the actual Telegram app to our database.
-            When user reads messages in Telegram (mobile/desktop), this event fires
-            and we update our unreadCount to match Telegram's state.
+        # LINEAR-STYLE: Instant online/offline status (errors ignored - too noisy)
+        self.client.add_event_handler(self._handle_user_status_event, events.UserUpdate)
 
-            This ensures the CRM always reflects Telegram's actual read state.
-            """
-            try:
-                await self._handle_read_event(event)
-            except Exception as e:
-                self._add_error(f"Error handling read event: {e}")
-                traceback.print_exc()
-
-        @self.client.on(events.UserUpdate)
-        async def on_user_update(event):
-            """
-            Handle real-time user status updates (online/offline).
-
-            LINEAR-STYLE: Instant status updates without polling.
-            When a user goes online/offline, Telegram sends this event
-            and we update our Contact.isOnline/lastSeenAt immediately.
-            """
-            try:
-                await self._handle_user_status_event(event)
-            except Exception as e:
-                # Don't log errors for user status - too noisy
-                pass
-
-        @self.client.on(events.Raw(types=[UpdateDialogUnreadMark]))
-        async def on_dialog_unread_mark(event):
-            """
-            Handle real-time "mark as unread" events from Telegram.
-
-            LINEAR-STYLE: Instant unread state sync without polling.
-            When a user marks a conversation as unread in Telegram,
-            this event fires and we update our unreadCount immediately.
-            """
-            try:
-                await self._handle_dialog_unread_mark(event)
-            except Exception as e:
-                log(f"[UNREAD-MARK] Error: {e}", "ERROR")
-                traceback.print_exc()
+        # LINEAR-STYLE: Instant "mark as unread" sync
+        self.client.add_event_handler(
+            self._handle_dialog_unread_mark, events.Raw(types=[UpdateDialogUnreadMark])
+        )
 
     async def _handle_user_status_event(self, event):
         """
@@ -357,69 +766,65 @@ class RealtimeListener:
             if not status:
                 return
 
-            # Determine status values
-            is_online = False
-            online_status = 'unknown'
-            last_seen_at = None
-
-            if isinstance(status, UserStatusOnline):
-                is_online = True
-                online_status = 'online'
-            elif isinstance(status, UserStatusOffline):
-                online_status = 'offline'
-                last_seen_at = status.was_online
-            elif isinstance(status, UserStatusRecently):
-                online_status = 'recently'
-            elif isinstance(status, UserStatusLastWeek):
-                online_status = 'last_week'
-            elif isinstance(status, UserStatusLastMonth):
-                online_status = 'last_month'
-
-            # Update contact in database
-            external_user_id = str(user_id)
-            cursor = self.conn.cursor()
-            try:
-                if last_seen_at:
-                    cursor.execute("""
-                        UPDATE telegram_crm."Contact" c
-                        SET "isOnline" = %s,
-                            "onlineStatus" = %s,
-                            "lastSeenAt" = %s,
-                            "lastStatusCheck" = NOW(),
-                            "updatedAt" = NOW()
-                        FROM telegram_crm."SourceIdentity" si
-                        WHERE si."contactId" = c.id
-                          AND si.source = 'telegram'
-                          AND si."externalId" = %s
-                    """, (is_online, online_status, last_seen_at, external_user_id))
-                else:
-                    cursor.execute("""
-                        UPDATE telegram_crm."Contact" c
-                        SET "isOnline" = %s,
-                            "onlineStatus" = %s,
-                            "lastStatusCheck" = NOW(),
-                            "updatedAt" = NOW()
-                        FROM telegram_crm."SourceIdentity" si
-                        WHERE si."contactId" = c.id
-                          AND si.source = 'telegram'
-                          AND si."externalId" = %s
-                    """, (is_online, online_status, external_user_id))
-
-                if cursor.rowcount > 0:
-                    self.conn.commit()
-                    if is_online:
-                        log(f"[USER-STATUS] User {user_id}: ONLINE (real-time)")
-                else:
-                    self.conn.rollback()
+            # Determine status values (one dict lookup per event)
+            is_online, online_status, last_seen_attr = USER_STATUS_VALUES.get(
+                type(status), UNKNOWN_USER_STATUS
+            )
+            last_seen_at = getattr(status, last_seen_attr) if last_seen_attr else None
 
-                cursor.close()
-            except Exception as e:
-                self.conn.rollback()
-                cursor.close()
+            # Status updates arrive in storms and flip back and forth; keep
+            # only the latest per user and write them in one batch per window
+            if not self._pending_user_statuses:
+                self._user_statuses_event.set()
+            self._pending_user_statuses[str(user_id)] = (is_online, online_status, last_seen_at)
 
         except Exception as e:
             pass  # Silently ignore - user might not be a contact
 
+    async def _user_status_flush_loop(self):
+        """
+        Apply pending contact status updates in one statement per window.
+
+        Waits (no timer) for the first update, lets USER_STATUS_FLUSH_WINDOW
+        of them collect, then writes the latest status for each user. On
+        failure, updates not superseded in the meantime are kept for the
+        next window.
+        """
+        while True:
+            await self._user_statuses_event.wait()
+            await asyncio.sleep(USER_STATUS_FLUSH_WINDOW)
+
+            pending = self._pending_user_statuses
+            self._pending_user_statuses = {}
+            self._user_statuses_event.clear()
+            if not pending:
+                continue
+
+            try:
+                online = await self._run_db(self._write_user_statuses, [
+                    (user_id, is_online, online_status, last_seen_at)
+                    for user_id, (is_online, online_status, last_seen_at) in pending.items()
+                ])
+                for user_id in online:
+                    log(f"[USER-STATUS] User {user_id}: ONLINE (real-time)")
+            except Exception as e:
+                log("[USER-STATUS] Failed to write %s status updates: %s", len(pending), e, level='WARN')
+                for user_id, value in pending.items():
+                    self._pending_user_statuses.setdefault(user_id, value)
+                self._user_statuses_event.set()
+                await asyncio.sleep(5)  # DB trouble - don't retry every window
+
+    def _write_user_statuses(self, rows: List[tuple]) -> List[str]:
+        """
+        Update many contacts' online status (runs on a DB thread).
+
+        Returns the Telegram user IDs that matched a contact and are online.
+        """
+        with self._pooled_cursor() as cursor:
+            updated = execute_values(cursor, UPDATE_USER_STATUSES_SQL, rows,
+                template="(%s, %s::boolean, %s, %s::timestamptz)", page_size=500, fetch=True)
+            return [user_id for user_id, is_online in updated if is_online]
+
     async def _handle_dialog_unread_mark(self, event):
         """
         Process real-time "mark as unread" event from Telegram.
@@ -449,56 +854,55 @@ class RealtimeListener:
             else:
                 return
 
-            # Find conversation in database
-            cursor = self.conn.cursor()
-            try:
-                cursor.execute("""
-                    SELECT id, title, "unreadCount"
-                    FROM telegram_crm."Conversation"
-                    WHERE "externalChatId" = %s
-                    LIMIT 1
-                """, (external_id,))
-                row = cursor.fetchone()
+            # Find and update the conversation on a DB thread
+            title = await self._run_db(self._write_unread_mark, external_id, unread)
+            if title is not None:
+                state = 'UNREAD' if unread else 'READ'
+                log(f"[UNREAD-MARK] {title}: marked {state} (instant)")
 
-                if not row:
-                    cursor.close()
-                    return
+        except Exception as e:
+            log("[UNREAD-MARK] Error processing event: %s", e, level='ERROR')
 
-                conv_id, title, current_unread = row
+    def _write_unread_mark(self, external_id: str, unread: bool) -> Optional[str]:
+        """
+        Apply a dialog unread mark (runs on a DB thread).
 
-                if unread:
-                    # Marked as unread - set unreadCount to at least 1
-                    new_unread = max(1, current_unread or 0)
-                    cursor.execute("""
-                        UPDATE telegram_crm."Conversation"
-                        SET "unreadCount" = %s,
-                            "lastReadAt" = NULL,
-                            "updatedAt" = NOW()
-                        WHERE id = %s
-                    """, (new_unread, conv_id))
-                    self.conn.commit()
-                    log(f"[UNREAD-MARK] {title}: marked UNREAD (instant)")
-                else:
-                    # Marked as read - set unreadCount to 0
-                    cursor.execute("""
-                        UPDATE telegram_crm."Conversation"
-                        SET "unreadCount" = 0,
-                            "lastReadAt" = NOW(),
-                            "updatedAt" = NOW()
-                        WHERE id = %s
-                    """, (conv_id,))
-                    self.conn.commit()
-                    log(f"[UNREAD-MARK] {title}: marked READ (instant)")
+        Returns the conversation title, or None if the chat isn't tracked.
+        """
+        with self._pooled_cursor() as cursor:
+            cursor.execute("""
+                SELECT id, title, "unreadCount"
+                FROM telegram_crm."Conversation"
+                WHERE "externalChatId" = %s
+                LIMIT 1
+            """, (external_id,))
+            row = cursor.fetchone()
 
-                cursor.close()
+            if not row:
+                return None
 
-            except Exception as e:
-                self.conn.rollback()
-                cursor.close()
-                raise e
+            conv_id, title, current_unread = row
 
-        except Exception as e:
-            log(f"[UNREAD-MARK] Error processing event: {e}", "ERROR")
+            if unread:
+                # Marked as unread - set unreadCount to at least 1
+                new_unread = max(1, current_unread or 0)
+                cursor.execute("""
+                    UPDATE telegram_crm."Conversation"
+                    SET "unreadCount" = %s,
+                        "lastReadAt" = NULL,
+                        "updatedAt" = NOW()
+                    WHERE id = %s
+                """, (new_unread, conv_id))
+            else:
+                # Marked as read - set unreadCount to 0
+                cursor.execute("""
+                    UPDATE telegram_crm."Conversation"
+                    SET "unreadCount" = 0,
+                        "lastReadAt" = NOW(),
+                        "updatedAt" = NOW()
+                    WHERE id = %s
+                """, (conv_id,))
+            return title
 
     async def _enqueue_message(self, message: Message, source: str = 'unknown'):
         """
@@ -524,11 +928,13 @@ class RealtimeListener:
 
         dedup_key = f"{chat_id}:{message.id}"
 
-        # In-memory dedup (fast path)
-        if dedup_key in self._processed_message_ids:
+        # In-memory dedup (fast path): already written, or already waiting
+        # (events, polling and catch-up often see the same message)
+        if dedup_key in self._processed_message_ids or dedup_key in self._queued_message_ids:
             return
 
         # Add to queue for processing
+        self._queued_message_ids.add(dedup_key)
         await self._message_queue.put({
             'message': message,
             'source': source,
@@ -571,44 +977,26 @@ class RealtimeListener:
 
         while self.running and not self._shutdown_requested:
             try:
-                # Wait for message with timeout (allows checking shutdown)
-                try:
-                    item = await asyncio.wait_for(
-                        self._message_queue.get(),
-                        timeout=1.0
-                    )
-                except asyncio.TimeoutError:
-                    continue
-
-                message = item['message']
-                source = item['source']
-                dedup_key = item['dedup_key']
-                chat_id = item['chat_id']
-
-                # Double-check in-memory dedup
-                if dedup_key in self._processed_message_ids:
-                    continue
-
-                # Process the message
-                try:
-                    was_inserted = await self._process_message_idempotent(
-                        message, chat_id, source
-                    )
-
-                    if was_inserted:
-                        # Mark as processed only if actually inserted
-                        self._processed_message_ids.add(dedup_key)
+                # Block on the queue itself - no per-iteration timeout timer;
+                # request_shutdown() wakes us with the _STOP sentinel
+                item = await self._message_queue.get()
+                if item is _STOP:
+                    break
 
-                        # Limit memory usage - keep last 10000 message IDs
-                        if len(self._processed_message_ids) > 10000:
-                            # Remove oldest entries (convert to list, slice, convert back)
-                            self._processed_message_ids = set(
-                                list(self._processed_message_ids)[-5000:]
-                            )
+                # Take whatever else is already waiting (catch-up/poll bursts)
+                # so it's written in one INSERT instead of one per message
+                batch = [item]
+                stop = False
+                while len(batch) < PROCESSOR_BATCH_SIZE and not self._message_queue.empty():
+                    item = self._message_queue.get_nowait()
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
 
-                except Exception as e:
-                    self._add_error(f"Error processing message: {e}")
-                    traceback.print_exc()
+                await self._process_batch(batch)
+                if stop:
+                    break
 
             except Exception as e:
                 self._add_error(f"Error in message processor: {e}")
@@ -616,19 +1004,68 @@ class RealtimeListener:
 
         log("[PROCESSOR] Message processor stopped")
 
-    async def _process_message_idempotent(
-        self, message: Message, chat_id: int, source: str
-    ) -> bool:
-        """
-        Process a single message idempotently.
+    def _mark_processed(self, dedup_key: str) -> None:
+        """Remember a stored message key, keeping the last PROCESSED_IDS_SIZE (memory bound)."""
+        self._processed_message_ids[dedup_key] = None
+        if len(self._processed_message_ids) > PROCESSED_IDS_SIZE:
+            self._processed_message_ids.popitem(last=False)
 
-        Returns True if message was actually inserted (new), False if duplicate.
+    async def _process_batch(self, items: List[Dict]):
+        """
+        Process a batch of queued messages idempotently.
 
-        Uses database-level idempotency:
+        Each message is resolved to its conversation and prepared one by
+        one (a failure only skips that message), then all of them are
+        inserted together. Uses database-level idempotency:
         - INSERT ... ON CONFLICT DO NOTHING
-        - Check rowcount to know if insert happened
-        - Only update unreadCount if insert succeeded
+        - RETURNING tells which rows were actually inserted
+        - Only new messages are counted, logged and bump unreadCount
         """
+        entries = []
+        for item in items:
+            dedup_key = item['dedup_key']
+            self._queued_message_ids.discard(dedup_key)
+
+            # Double-check in-memory dedup
+            if dedup_key in self._processed_message_ids:
+                continue
+
+            try:
+                prepared = await self._prepare_for_insert(item['message'], item['chat_id'])
+            except Exception as e:
+                self._add_error(f"Error processing message: {e}")
+                self._print_exc()
+                continue
+
+            if prepared:
+                entries.append((dedup_key, item['source']) + prepared)
+
+        if not entries:
+            return
+
+        # Insert with idempotency check (on the DB thread)
+        try:
+            if len(entries) == 1:
+                _, _, conversation, msg_data = entries[0]
+                was_inserted = await self._run_db(self._write_message, conversation['id'], msg_data)
+                inserted = {(conversation['id'], msg_data['external_message_id'])} if was_inserted else set()
+            else:
+                inserted = await self._run_db(self._write_messages, [
+                    (conversation['id'], msg_data) for _, _, conversation, msg_data in entries
+                ])
+        except Exception as e:
+            self._add_error(f"Error processing message: {e}")
+            self._print_exc()
+            return
+
+        for dedup_key, source, conversation, msg_data in entries:
+            if (conversation['id'], msg_data['external_message_id']) in inserted:
+                # Mark as processed only if actually inserted
+                self._mark_processed(dedup_key)
+                self._on_message_stored(conversation, msg_data, source)
+
+    async def _prepare_for_insert(self, message: Message, chat_id: int) -> Optional[tuple]:
+        """Resolve a message's conversation and build its row data; (conversation, msg_data) or None to skip."""
         # Find conversation
         conversation = await self._get_conversation(str(chat_id))
 
@@ -640,36 +1077,82 @@ class RealtimeListener:
             )
 
         if not conversation or 'id' not in conversation:
-            return False
+            return None
 
         if conversation.get('is_sync_disabled'):
-            return False
+            return None
 
         # Prepare message data
         msg_data = await self._prepare_message(message)
         if not msg_data:
-            return False
+            return None
 
-        # Insert with idempotency check
-        cursor = self.conn.cursor()
+        return conversation, msg_data
+
+    def _on_message_stored(self, conversation: Dict, msg_data: Dict[str, Any], source: str):
+        """Bookkeeping for a newly inserted message: conversation bump, counters, log, callback."""
+        self._queue_conversation_update(
+            conversation['id'], msg_data['sent_at'],
+            int(msg_data['external_message_id']), 1 if msg_data['direction'] == 'inbound' else 0
+        )
+
+        # Log and update counters
+        self.messages_received += 1
+        direction = "OUT" if msg_data['direction'] == 'outbound' else "IN"
+        preview = (msg_data['body'][:40] + '...') if len(msg_data['body']) > 40 else msg_data['body']
+        log(f"[{source.upper()}] [{direction}] {conversation.get('title', 'Unknown')}: {preview}")
+
+        self._count_message_stat()
+
+        self._fire(self.on_message_callback)
+
+    async def _run_db(self, fn, *args):
+        """Run a blocking DB function on one of the listener's DB threads."""
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, fn, *args)
+
+    async def _run_state(self, fn, *args):
+        """Run a blocking lock/state manager call on the listener's state thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._state_executor, fn, *args)
+
+    @contextmanager
+    def _pooled_cursor(self):
+        """
+        Check out a pooled connection for one transaction.
+
+        Commits on success, rolls back on any exception, and always
+        returns the connection to the pool.
+        """
+        conn = self._pool.getconn()
+        cursor = conn.cursor()
         try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.prepared.clear()
+            raise
+        finally:
+            cursor.close()
+            self._pool.putconn(conn)
+
+    def _write_message(self, conversation_id: str, msg_data: Dict[str, Any]) -> bool:
+        """
+        Insert one message (runs on a DB thread).
+
+        Returns True if the message was new. The caller queues the
+        conversation bump for new messages only, so a duplicate never
+        touches unreadCount.
+        """
+        with self._pooled_cursor() as cursor:
             # Resolve contact
             contact_id = None
             if msg_data.get('sender_telegram_id'):
                 contact_id = self._find_contact(cursor, msg_data['sender_telegram_id'])
 
             # Idempotent insert - ON CONFLICT DO NOTHING
-            cursor.execute("""
-                INSERT INTO telegram_crm."Message" (
-                    id, "conversationId", "contactId", source, "externalMessageId",
-                    direction, "contentType", body, "sentAt", status,
-                    "hasAttachments", attachments, metadata, "createdAt"
-                )
-                VALUES (%s, %s, %s, 'telegram', %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-                ON CONFLICT (source, "conversationId", "externalMessageId") DO NOTHING
-            """, (
+            execute_prepared(cursor, 'insert_message', INSERT_MESSAGE_SQL, (
                 msg_data['id'],
-                conversation['id'],
+                conversation_id,
                 contact_id,
                 msg_data['external_message_id'],
                 msg_data['direction'],
@@ -678,67 +1161,97 @@ class RealtimeListener:
                 msg_data['sent_at'],
                 msg_data['status'],
                 msg_data['has_attachments'],
-                Json(msg_data['attachments']) if msg_data.get('attachments') else None,
-                Json(msg_data['metadata'])
+                as_json(msg_data['attachments']) if msg_data.get('attachments') else None,
+                as_json(msg_data['metadata'])
             ))
 
             # Check if insert actually happened
-            was_inserted = cursor.rowcount > 0
-
-            if was_inserted:
-                # Update conversation - only increment unreadCount for NEW inbound messages
-                if msg_data['direction'] == 'inbound':
-                    cursor.execute("""
-                        UPDATE telegram_crm."Conversation"
-                        SET "lastMessageAt" = GREATEST("lastMessageAt", %s),
-                            "lastSyncedMessageId" = GREATEST(
-                                COALESCE("lastSyncedMessageId", '0')::bigint,
-                                %s::bigint
-                            )::text,
-                            "lastSyncedAt" = NOW(),
-                            "unreadCount" = "unreadCount" + 1,
-                            "updatedAt" = NOW()
-                        WHERE id = %s
-                    """, (msg_data['sent_at'], msg_data['external_message_id'], conversation['id']))
-                else:
-                    cursor.execute("""
-                        UPDATE telegram_crm."Conversation"
-                        SET "lastMessageAt" = GREATEST("lastMessageAt", %s),
-                            "lastSyncedMessageId" = GREATEST(
-                                COALESCE("lastSyncedMessageId", '0')::bigint,
-                                %s::bigint
-                            )::text,
-                            "lastSyncedAt" = NOW(),
-                            "updatedAt" = NOW()
-                        WHERE id = %s
-                    """, (msg_data['sent_at'], msg_data['external_message_id'], conversation['id']))
+            return cursor.rowcount > 0
 
-                self.conn.commit()
+    def _write_messages(self, messages: List[tuple]) -> set:
+        """
+        Insert many (conversation_id, msg_data) messages in one statement (runs on a DB thread).
 
-                # Log and update counters
-                self.messages_received += 1
-                direction = "OUT" if msg_data['direction'] == 'outbound' else "IN"
-                preview = (msg_data['body'][:40] + '...') if len(msg_data['body']) > 40 else msg_data['body']
-                log(f"[{source.upper()}] [{direction}] {conversation.get('title', 'Unknown')}: {preview}")
+        Returns the (conversationId, externalMessageId) pairs that were new.
+        """
+        with self._pooled_cursor() as cursor:
+            # Resolve every sender's contact in one query
+            contacts = self._find_contacts(
+                cursor, {m['sender_telegram_id'] for _, m in messages if m.get('sender_telegram_id')}
+            )
 
-                try:
-                    self.state_manager.increment_messages()
-                except:
-                    pass
+            rows = [(
+                msg['id'], conversation_id, contacts.get(msg.get('sender_telegram_id')),
+                msg['external_message_id'], msg['direction'],
+                msg['content_type'], msg['body'], msg['sent_at'],
+                msg['status'], msg['has_attachments'],
+                as_json(msg['attachments']) if msg.get('attachments') else None,
+                as_json(msg['metadata'])
+            ) for conversation_id, msg in messages]
+
+            inserted = execute_values(cursor, INSERT_MESSAGES_RETURNING_SQL, rows,
+                template="(%s, %s, %s, 'telegram', %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())",
+                page_size=PROCESSOR_BATCH_SIZE, fetch=True)
+            return {(conversation_id, external_id) for conversation_id, external_id in inserted}
+
+    def _queue_conversation_update(self, conversation_id: str, sent_at,
+                                   external_id: int, inbound: int) -> None:
+        """Merge new message(s) into their conversation's pending bump."""
+        pending = self._pending_conversation_updates.get(conversation_id)
+        if pending is None:
+            self._pending_conversation_updates[conversation_id] = [sent_at, external_id, inbound]
+            self._conversation_updates_event.set()
+            return
+        if sent_at > pending[0]:
+            pending[0] = sent_at
+        if external_id > pending[1]:
+            pending[1] = external_id
+        pending[2] += inbound
 
-                if self.on_message_callback:
-                    self.on_message_callback()
+    async def _conversation_flush_loop(self):
+        """
+        Apply pending conversation bumps in one statement per window.
 
-            else:
-                self.conn.rollback()
+        Waits (no timer) until a message queues a bump, gives the burst
+        CONVERSATION_FLUSH_WINDOW to collect, then writes every pending
+        conversation at once. Failed flushes are merged back for the next
+        window; whatever is pending at shutdown is flushed before exiting.
+        """
+        try:
+            while True:
+                await self._conversation_updates_event.wait()
+                await asyncio.sleep(CONVERSATION_FLUSH_WINDOW)
+                if not await self._flush_conversation_updates():
+                    await asyncio.sleep(5)  # DB trouble - don't retry every window
+        finally:
+            if self._pending_conversation_updates:
+                await self._flush_conversation_updates()
 
-            cursor.close()
-            return was_inserted
+    async def _flush_conversation_updates(self) -> bool:
+        """Write and clear the pending conversation bumps. Returns False if the write failed."""
+        pending = self._pending_conversation_updates
+        self._pending_conversation_updates = {}
+        self._conversation_updates_event.clear()
+        if not pending:
+            return True
 
+        try:
+            await self._run_db(self._write_conversation_updates, [
+                (conv_id, sent_at, external_id, inbound)
+                for conv_id, (sent_at, external_id, inbound) in pending.items()
+            ])
         except Exception as e:
-            self.conn.rollback()
-            cursor.close()
-            raise e
+            log("Failed to flush %s conversation updates: %s", len(pending), e, level='WARN')
+            for conv_id, (sent_at, external_id, inbound) in pending.items():
+                self._queue_conversation_update(conv_id, sent_at, external_id, inbound)
+            return False
+        return True
+
+    def _write_conversation_updates(self, rows: List[tuple]):
+        """Bump lastMessageAt/checkpoint/unreadCount for many conversations (runs on a DB thread)."""
+        with self._pooled_cursor() as cursor:
+            execute_values(cursor, UPDATE_CONVERSATIONS_SQL, rows,
+                template="(%s, %s, %s::bigint, %s::integer)", page_size=500)
 
     async def _handle_read_event(self, event):
         """
@@ -858,30 +1371,16 @@ class RealtimeListener:
             except Exception as e:
                 self.conn.rollback()
                 cursor.close()
-                log(f"[STATUS-SYNC] Error updating unread for {title}: {e}", level='WARN')
+                log("[STATUS-SYNC] Error updating unread for %s: %s", title, e, level='WARN')
 
             # 2. SYNC USER STATUS (for private chats only)
             entity = getattr(dialog, 'entity', None)
             if entity and isinstance(entity, User):
                 user_status = getattr(entity, 'status', None)
-                online_status = None
-                last_seen_at = None
-                is_online = False
-
-                if isinstance(user_status, UserStatusOnline):
-                    online_status = 'online'
-                    is_online = True
-                elif isinstance(user_status, UserStatusOffline):
-                    online_status = 'offline'
-                    last_seen_at = user_status.was_online
-                elif isinstance(user_status, UserStatusRecently):
-                    online_status = 'recently'  # Within 1-3 days
-                elif isinstance(user_status, UserStatusLastWeek):
-                    online_status = 'last_week'
-                elif isinstance(user_status, UserStatusLastMonth):
-                    online_status = 'last_month'
-                else:
-                    online_status = 'unknown'
+                is_online, online_status, last_seen_attr = USER_STATUS_VALUES.get(
+                    type(user_status), UNKNOWN_USER_STATUS
+                )
+                last_seen_at = getattr(user_status, last_seen_attr) if last_seen_attr else None
 
                 # Find contact by external ID and update status
                 external_user_id = str(entity.id)
@@ -933,7 +1432,7 @@ class RealtimeListener:
             return updates_made
 
         except Exception as e:
-            log(f"[STATUS-SYNC] Error syncing status for {title}: {e}", level='WARN')
+            log("[STATUS-SYNC] Error syncing status for %s: %s", title, e, level='WARN')
             return False
 
     def _get_user_status_text(self, status) -> str:
@@ -953,7 +1452,8 @@ class RealtimeListener:
 
     async def _handle_message(self, message: Message, is_edit: bool = False):
         """Process a single message and save to database."""
-        if not isinstance(message, Message) or not message.id:
+        # NewMessage events always carry a Message
+        if not message.id:
             return
 
         # Get chat info
@@ -979,21 +1479,21 @@ class RealtimeListener:
                         if msg_count > 0:
                             log(f"[MESSAGE] Synced {msg_count} initial messages for {conversation.get('title', 'Unknown')}")
                     except Exception as sync_err:
-                        log(f"[MESSAGE] Failed to sync initial messages: {sync_err}", level='WARN')
+                        log("[MESSAGE] Failed to sync initial messages: %s", sync_err, level='WARN')
                 else:
-                    log(f"[MESSAGE] WARN: Auto-create returned None for chat_id={chat_id}", level='WARN')
+                    log("[MESSAGE] WARN: Auto-create returned None for chat_id=%s", chat_id, level='WARN')
             except Exception as e:
-                log(f"[MESSAGE] ERROR: Auto-create exception for chat_id={chat_id}: {e}", level='ERROR')
-                traceback.print_exc()
+                log("[MESSAGE] ERROR: Auto-create exception for chat_id=%s: %s", chat_id, e, level='ERROR')
+                self._print_exc()
 
         if not conversation:
             # Still not found after auto-create attempt - skip
-            log(f"Skipping message from unknown chat {chat_id} (auto-create failed)", level='WARN')
+            log("Skipping message from unknown chat %s (auto-create failed)", chat_id, level='WARN')
             return
 
         # Defensive check - ensure conversation has 'id' key
         if 'id' not in conversation:
-            log(f"ERROR: Conversation missing 'id' key for chat {chat_id}: {conversation}", level='ERROR')
+            log("ERROR: Conversation missing 'id' key for chat %s: %s", chat_id, conversation, level='ERROR')
             # Clear cache and retry
             if str(chat_id) in self._conversation_cache:
                 del self._conversation_cache[str(chat_id)]
@@ -1040,8 +1540,8 @@ class RealtimeListener:
                 msg_data['sent_at'],
                 msg_data['status'],
                 msg_data['has_attachments'],
-                Json(msg_data['attachments']) if msg_data.get('attachments') else None,
-                Json(msg_data['metadata'])
+                as_json(msg_data['attachments']) if msg_data.get('attachments') else None,
+                as_json(msg_data['metadata'])
             ))
 
             # Update conversation timestamps and unread count
@@ -1078,14 +1578,10 @@ class RealtimeListener:
             log(f"{action} [{direction}] {conversation.get('title', 'Unknown')}: {preview}")
 
             # Update state
-            try:
-                self.state_manager.increment_messages()
-            except:
-                pass
+            self._count_message_stat()
 
             # Call callback
-            if self.on_message_callback:
-                self.on_message_callback()
+            self._fire(self.on_message_callback)
 
         except Exception as e:
             self.conn.rollback()
@@ -1112,34 +1608,51 @@ class RealtimeListener:
         total_synced = 0
         skipped = 0
 
-        for conv_id, chat_id, title, last_synced_id in conversations:
-            if self._shutdown_requested:
-                break
+        # Telegram fetches are I/O-bound: run a few conversations at once
+        # (well under Telegram's concurrent-request limits); each batch
+        # insert uses its own pooled DB connection
+        semaphore = asyncio.Semaphore(CATCH_UP_CONCURRENCY)
 
-            min_id = int(last_synced_id) if last_synced_id else 0
+        async def catch_up_one(conv_id, chat_id, title, last_synced_id):
+            nonlocal total_synced, skipped
+            async with semaphore:
+                if self._shutdown_requested:
+                    return
 
-            try:
-                messages = []
-                async for msg in self.client.iter_messages(
-                    int(chat_id),
-                    min_id=min_id,
-                    limit=CATCH_UP_LIMIT
-                ):
-                    if isinstance(msg, Message) and msg.id and str(msg.id) != str(last_synced_id):
-                        msg_data = await self._prepare_message(msg)
+                min_id = int(last_synced_id) if last_synced_id else 0
+
+                try:
+                    raw_messages = [
+                        msg async for msg in self.client.iter_messages(
+                            int(chat_id),
+                            min_id=min_id,
+                            limit=CATCH_UP_LIMIT
+                        )
+                        if isinstance(msg, Message) and msg.id and str(msg.id) != str(last_synced_id)
+                    ]
+
+                    senders = await self._resolve_senders(raw_messages)
+                    messages = []
+                    for msg in raw_messages:
+                        msg_data = await self._prepare_message(msg, senders.get(msg.sender_id))
                         if msg_data:
                             messages.append(msg_data)
 
-                if messages:
-                    # Bulk insert
-                    await self._bulk_insert_messages(conv_id, messages)
-                    total_synced += len(messages)
-                    log(f"  {title}: {len(messages)} messages")
-                else:
-                    skipped += 1
+                    if messages:
+                        # Bulk insert
+                        await self._bulk_insert_messages(conv_id, messages)
+                        total_synced += len(messages)
+                        log(f"  {title}: {len(messages)} messages")
+                    else:
+                        skipped += 1
 
-            except Exception as e:
-                self._add_error(f"Catch-up error for {title}: {e}")
+                except Exception as e:
+                    self._add_error(f"Catch-up error for {title}: {e}")
+
+        await asyncio.gather(
+            *(catch_up_one(*row) for row in conversations),
+            return_exceptions=True
+        )
 
         log(f"Catch-up complete: {total_synced} messages synced, {skipped} conversations up-to-date")
 
@@ -1178,24 +1691,31 @@ class RealtimeListener:
             log(f"[EMPTY-SYNC] Found {len(empty_convs)} conversations with 0 messages")
 
             synced_count = 0
-            for conv_id, chat_id, title in empty_convs:
-                if self._shutdown_requested:
-                    break
+            semaphore = asyncio.Semaphore(CATCH_UP_CONCURRENCY)
 
-                try:
-                    msg_count = await self._sync_initial_messages(conv_id, int(chat_id))
-                    if msg_count > 0:
-                        log(f"[EMPTY-SYNC] {title}: synced {msg_count} messages")
-                        synced_count += 1
-                    else:
-                        log(f"[EMPTY-SYNC] {title}: no messages found in Telegram")
-                except Exception as e:
-                    log(f"[EMPTY-SYNC] Error syncing {title}: {e}", level='WARN')
+            async def sync_one(conv_id, chat_id, title):
+                nonlocal synced_count
+                async with semaphore:
+                    if self._shutdown_requested:
+                        return
+
+                    try:
+                        msg_count = await self._sync_initial_messages(conv_id, int(chat_id))
+                        if msg_count > 0:
+                            log(f"[EMPTY-SYNC] {title}: synced {msg_count} messages")
+                            synced_count += 1
+                        else:
+                            log(f"[EMPTY-SYNC] {title}: no messages found in Telegram")
+                    except Exception as e:
+                        log("[EMPTY-SYNC] Error syncing %s: %s", title, e, level='WARN')
+
+            # Overlap the Telegram fetches, as in catch-up
+            await asyncio.gather(*(sync_one(*row) for row in empty_convs))
 
             log(f"[EMPTY-SYNC] Complete: synced messages for {synced_count}/{len(empty_convs)} conversations")
 
         except Exception as e:
-            log(f"[EMPTY-SYNC] Error: {e}", level='ERROR')
+            log("[EMPTY-SYNC] Error: %s", e, level='ERROR')
             if cursor:
                 cursor.close()
 
@@ -1204,50 +1724,38 @@ class RealtimeListener:
         if not messages:
             return
 
-        cursor = self.conn.cursor()
-        try:
-            for msg in messages:
-                contact_id = None
-                if msg.get('sender_telegram_id'):
-                    contact_id = self._find_contact(cursor, msg['sender_telegram_id'])
+        await self._run_db(self._insert_message_batch, conversation_id, messages)
 
-                cursor.execute("""
-                    INSERT INTO telegram_crm."Message" (
-                        id, "conversationId", "contactId", source, "externalMessageId",
-                        direction, "contentType", body, "sentAt", status,
-                        "hasAttachments", attachments, metadata, "createdAt"
-                    )
-                    VALUES (%s, %s, %s, 'telegram', %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-                    ON CONFLICT (source, "conversationId", "externalMessageId") DO NOTHING
-                """, (
-                    msg['id'], conversation_id, contact_id,
-                    msg['external_message_id'], msg['direction'],
-                    msg['content_type'], msg['body'], msg['sent_at'],
-                    msg['status'], msg['has_attachments'],
-                    Json(msg['attachments']) if msg.get('attachments') else None,
-                    Json(msg['metadata'])
-                ))
+    def _insert_message_batch(self, conversation_id: str, messages: list):
+        """Insert a batch of messages and advance the checkpoint (runs on a DB thread)."""
+        with self._pooled_cursor() as cursor:
+            # Resolve every sender's contact in one query instead of one per message
+            contacts = self._find_contacts(
+                cursor, {m['sender_telegram_id'] for m in messages if m.get('sender_telegram_id')}
+            )
+
+            rows = [(
+                msg['id'], conversation_id, contacts.get(msg.get('sender_telegram_id')),
+                msg['external_message_id'], msg['direction'],
+                msg['content_type'], msg['body'], msg['sent_at'],
+                msg['status'], msg['has_attachments'],
+                as_json(msg['attachments']) if msg.get('attachments') else None,
+                as_json(msg['metadata'])
+            ) for msg in messages]
+
+            # One multi-row INSERT per page instead of a round-trip per message
+            execute_values(cursor, INSERT_MESSAGE_BATCH_SQL, rows,
+                template="(%s, %s, %s, 'telegram', %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())",
+                page_size=500)
 
             # Update conversation checkpoint
             highest_id = max(int(m['external_message_id']) for m in messages)
             latest_time = max(m['sent_at'] for m in messages)
 
-            # Count inbound messages for unread tracking
-            inbound_count = sum(1 for m in messages if m['direction'] == 'inbound')
-
-            cursor.execute("""
-                UPDATE telegram_crm."Conversation"
-                SET "lastSyncedMessageId" = %s,
-                    "lastSyncedAt" = NOW(),
-                    "lastMessageAt" = GREATEST("lastMessageAt", %s),
-                    "unreadCount" = "unreadCount" + %s,
-                    "updatedAt" = NOW()
-                WHERE id = %s
-            """, (str(highest_id), latest_time, inbound_count, conversation_id))
+            # Count inbound messages for unread tracking
+            inbound_count = sum(1 for m in messages if m['direction'] == 'inbound')
 
-            self.conn.commit()
-        finally:
-            cursor.close()
+            cursor.execute(UPDATE_CHECKPOINT_SQL, (str(highest_id), latest_time, inbound_count, conversation_id))
 
     async def _sync_initial_messages(self, conversation_id: str, chat_id: int) -> int:
         """
@@ -1267,14 +1775,19 @@ class RealtimeListener:
 
         try:
             # Fetch recent messages from Telegram
-            async for msg in self.client.iter_messages(
-                chat_id,
-                limit=INITIAL_MESSAGE_SYNC_LIMIT
-            ):
-                if isinstance(msg, Message) and msg.id:
-                    msg_data = await self._prepare_message(msg)
-                    if msg_data:
-                        messages.append(msg_data)
+            raw_messages = [
+                msg async for msg in self.client.iter_messages(
+                    chat_id,
+                    limit=INITIAL_MESSAGE_SYNC_LIMIT
+                )
+                if isinstance(msg, Message) and msg.id
+            ]
+
+            senders = await self._resolve_senders(raw_messages)
+            for msg in raw_messages:
+                msg_data = await self._prepare_message(msg, senders.get(msg.sender_id))
+                if msg_data:
+                    messages.append(msg_data)
 
             if messages:
                 # Bulk insert messages
@@ -1286,11 +1799,42 @@ class RealtimeListener:
                 return 0
 
         except Exception as e:
-            log(f"[INITIAL-SYNC] Error syncing messages for {conversation_id}: {e}", level='ERROR')
+            log("[INITIAL-SYNC] Error syncing messages for %s: %s", conversation_id, e, level='ERROR')
             return 0
 
-    async def _prepare_message(self, message: Message) -> Optional[Dict[str, Any]]:
-        """Prepare message data for database."""
+    async def _resolve_senders(self, messages: List[Message]) -> Dict[int, Any]:
+        """
+        Resolve the user senders of a batch of messages ({user_id: entity}).
+
+        Senders Telegram already attached to the history response are used
+        as-is; the rest are fetched with one get_entity() call for the batch
+        instead of a get_sender() round-trip per message.
+        """
+        senders = {}
+        missing = set()
+        for msg in messages:
+            if isinstance(msg.from_id, PeerUser):
+                if msg.sender is not None:
+                    senders[msg.sender_id] = msg.sender
+                else:
+                    missing.add(msg.from_id.user_id)
+
+        missing -= senders.keys()
+        if missing:
+            try:
+                entities = await self.client.get_entity([PeerUser(user_id) for user_id in missing])
+                senders.update((entity.id, entity) for entity in entities)
+            except Exception as e:
+                log("Bulk sender lookup failed, falling back per message: %s", e, level='WARN')
+        return senders
+
+    async def _prepare_message(self, message: Message, sender=None) -> Optional[Dict[str, Any]]:
+        """
+        Prepare message data for database.
+
+        sender: pre-resolved sender entity (batch paths); looked up via
+        get_sender() when omitted.
+        """
         try:
             is_outgoing = message.out
             message_date = message.date.replace(tzinfo=timezone.utc)
@@ -1303,7 +1847,8 @@ class RealtimeListener:
             if isinstance(message.from_id, PeerUser):
                 sender_telegram_id = str(message.from_id.user_id)
                 try:
-                    sender = await message.get_sender()
+                    if sender is None:
+                        sender = await message.get_sender()
                     if sender:
                         if hasattr(sender, 'first_name'):
                             parts = [sender.first_name, getattr(sender, 'last_name', None)]
@@ -1316,9 +1861,7 @@ class RealtimeListener:
                     pass
 
             # Generate ID
-            msg_id = 'm' + hashlib.md5(
-                f"{message.id}-{message_date.timestamp()}".encode()
-            ).hexdigest()[:24]
+            msg_id = make_id('m', f"{message.id}-{message_date.timestamp()}")
 
             # Extract media/attachment info for inline display
             attachments = None
@@ -1344,9 +1887,9 @@ class RealtimeListener:
                             elif photo_bytes:
                                 log(f"[INLINE-IMAGE] Photo {message.id} too large ({len(photo_bytes)} bytes), skipping base64")
                         except asyncio.TimeoutError:
-                            log(f"[INLINE-IMAGE] Download timeout for photo {message.id}", level='WARN')
+                            log("[INLINE-IMAGE] Download timeout for photo %s", message.id, level='WARN')
                         except Exception as e:
-                            log(f"[INLINE-IMAGE] Download error for photo {message.id}: {e}", level='WARN')
+                            log("[INLINE-IMAGE] Download error for photo %s: %s", message.id, e, level='WARN')
 
                     files.append({
                         'type': 'photo',
@@ -1390,9 +1933,9 @@ class RealtimeListener:
                                     doc_base64 = f"data:{mime_type};base64,{doc_b64}"
                                     log(f"[INLINE-IMAGE] Downloaded image doc {message.id} ({len(doc_bytes)} bytes)")
                             except asyncio.TimeoutError:
-                                log(f"[INLINE-IMAGE] Download timeout for doc {message.id}", level='WARN')
+                                log("[INLINE-IMAGE] Download timeout for doc %s", message.id, level='WARN')
                             except Exception as e:
-                                log(f"[INLINE-IMAGE] Download error for doc {message.id}: {e}", level='WARN')
+                                log("[INLINE-IMAGE] Download error for doc %s: %s", message.id, e, level='WARN')
 
                         files.append({
                             'type': file_type,
@@ -1429,15 +1972,20 @@ class RealtimeListener:
             return None
 
     def _get_chat_id(self, message: Message) -> Optional[int]:
-        """Extract chat ID from message."""
-        if hasattr(message, 'chat_id'):
-            return message.chat_id
-        if hasattr(message.peer_id, 'channel_id'):
-            return -message.peer_id.channel_id
-        if hasattr(message.peer_id, 'chat_id'):
-            return -message.peer_id.chat_id
-        if hasattr(message.peer_id, 'user_id'):
-            return message.peer_id.user_id
+        """
+        Extract chat ID from message.
+
+        Same "marked" ID as message.chat_id (-100<id> for channels, -<id>
+        for basic groups), dispatched on the peer's exact type.
+        """
+        peer = message.peer_id
+        peer_type = type(peer)
+        if peer_type is PeerUser:
+            return peer.user_id
+        if peer_type is PeerChannel:
+            return -(1000000000000 + peer.channel_id)
+        if peer_type is PeerChat:
+            return -peer.chat_id
         return None
 
     async def _get_conversation(self, external_chat_id: str) -> Optional[Dict]:
@@ -1452,41 +2000,76 @@ class RealtimeListener:
             # Cache entry is corrupted (missing 'id'), refetch from database
             del self._conversation_cache[external_chat_id]
 
-        cursor = self.conn.cursor()
-        try:
-            cursor.execute("""
-                SELECT id, title, type, "isSyncDisabled"
-                FROM telegram_crm."Conversation"
-                WHERE "externalChatId" = %s AND source = 'telegram'
-            """, (external_chat_id,))
-            row = cursor.fetchone()
+        result = await self._run_db(self._select_conversation, external_chat_id)
 
-            result = None
-            if row:
-                result = {
-                    'id': row[0],
-                    'title': row[1],
-                    'type': row[2],
-                    'is_sync_disabled': row[3]
-                }
+        # Cache result (even if None)
+        self._conversation_cache[external_chat_id] = result
+        return result
 
-            # Cache result (even if None)
-            self._conversation_cache[external_chat_id] = result
-            return result
-        finally:
-            cursor.close()
+    def _select_conversation(self, external_chat_id: str) -> Optional[Dict]:
+        """Look up one conversation by external chat ID (runs on a DB thread)."""
+        with self._pooled_cursor() as cursor:
+            execute_prepared(cursor, 'select_conversation', SELECT_CONVERSATION_SQL, (external_chat_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            return {
+                'id': row[0],
+                'title': row[1],
+                'type': row[2],
+                'is_sync_disabled': row[3]
+            }
 
     def _find_contact(self, cursor, telegram_id: str) -> Optional[str]:
         """Find contact ID by Telegram user ID."""
-        cursor.execute("""
-            SELECT c.id
-            FROM telegram_crm."Contact" c
-            JOIN telegram_crm."SourceIdentity" si ON si."contactId" = c.id
-            WHERE si.source = 'telegram' AND si."externalId" = %s
-            LIMIT 1
-        """, (telegram_id,))
+        with self._contact_cache_lock:
+            if telegram_id in self._contact_cache:
+                return self._contact_cache[telegram_id]
+
+        execute_prepared(cursor, 'select_contact', SELECT_CONTACT_SQL, (telegram_id,))
         row = cursor.fetchone()
-        return row[0] if row else None
+        contact_id = row[0] if row else None
+
+        with self._contact_cache_lock:
+            self._contact_cache[telegram_id] = contact_id
+        return contact_id
+
+    def _find_contacts(self, cursor, telegram_ids) -> Dict[str, str]:
+        """Find contact IDs for many Telegram user IDs at once ({telegram_id: contact_id})."""
+        contacts = {}
+        missing = []
+        with self._contact_cache_lock:
+            for telegram_id in telegram_ids:
+                if telegram_id in self._contact_cache:
+                    if self._contact_cache[telegram_id] is not None:
+                        contacts[telegram_id] = self._contact_cache[telegram_id]
+                else:
+                    missing.append(telegram_id)
+
+        if not missing:
+            return contacts
+        cursor.execute(SELECT_CONTACTS_SQL, (missing,))
+        found = dict(cursor.fetchall())
+
+        with self._contact_cache_lock:
+            for telegram_id in missing:
+                self._contact_cache[telegram_id] = found.get(telegram_id)
+        contacts.update(found)
+        return contacts
+
+    def _find_conversations(self, external_chat_ids: List[str]) -> Dict[str, Dict]:
+        """Look up many conversations at once ({externalChatId: conversation}); runs on a DB thread."""
+        with self._pooled_cursor() as cursor:
+            cursor.execute(SELECT_CONVERSATIONS_SQL, (external_chat_ids,))
+            return {
+                row[0]: {
+                    'id': row[1],
+                    'title': row[2],
+                    'type': row[3],
+                    'is_sync_disabled': row[4]
+                }
+                for row in cursor.fetchall()
+            }
 
     async def _create_conversation_from_chat(self, chat_id: int, message: Message = None, source: str = 'message') -> Optional[Dict]:
         """
@@ -1515,79 +2098,37 @@ class RealtimeListener:
             log(f"[AUTO-CREATE] Got entity: {type(entity).__name__}")
 
             # Determine chat type and title
-            if isinstance(entity, User):
-                chat_type = 'private'
-                parts = [entity.first_name, entity.last_name]
-                title = ' '.join(filter(None, parts)) or 'Unknown User'
-                username = entity.username
-                log(f"[AUTO-CREATE] User: {title} (@{username})")
-            elif isinstance(entity, Chat):
-                chat_type = 'group'
-                title = entity.title or 'Unknown Group'
-                log(f"[AUTO-CREATE] Group: {title}")
-            elif isinstance(entity, Channel):
-                if entity.megagroup:
-                    chat_type = 'supergroup'
-                else:
-                    chat_type = 'channel'
-                title = entity.title or 'Unknown Channel'
-                username = entity.username
-                log(f"[AUTO-CREATE] Channel/Supergroup: {title} (@{username})")
+            chat_type, title, username = chat_info(entity)
+            log(f"[AUTO-CREATE] {chat_type}: {title} (@{username})")
 
         except Exception as e:
             error_msg = f"Failed to fetch entity for chat_id={chat_id}: {e}"
-            log(f"[AUTO-CREATE] {error_msg}", level='ERROR')
+            log("[AUTO-CREATE] %s", error_msg, level='ERROR')
             self._add_error(error_msg)
 
             # Record error for visibility
-            try:
-                self.state_manager.record_error(
-                    'entity_fetch',
-                    str(e),
-                    {'chat_id': chat_id, 'source': source}
-                )
-            except:
-                pass
+            self._record_error('entity_fetch', str(e), {'chat_id': chat_id, 'source': source})
 
             # Try to create with minimal info anyway (better than nothing)
             title = f"Chat {chat_id}"
             log(f"[AUTO-CREATE] Creating with fallback title: {title}")
 
-        # Generate conversation ID
-        conv_id = 'c' + hashlib.md5(f"telegram-{chat_id}".encode()).hexdigest()[:24]
-
         # Insert into database
-        cursor = self.conn.cursor()
         try:
-            log(f"[AUTO-CREATE] Inserting conversation: id={conv_id}, title={title}, type={chat_type}")
-            cursor.execute("""
-                INSERT INTO telegram_crm."Conversation" (
-                    id, source, "externalChatId", title, type,
-                    "isSyncDisabled", "createdAt", "updatedAt"
-                )
-                VALUES (%s, 'telegram', %s, %s, %s, FALSE, NOW(), NOW())
-                ON CONFLICT (source, "externalChatId")
-                DO UPDATE SET title = EXCLUDED.title, "updatedAt" = NOW()
-                RETURNING id, title, type, "isSyncDisabled"
-            """, (conv_id, str(chat_id), title, chat_type))
-
-            row = cursor.fetchone()
-            self.conn.commit()
+            log(f"[AUTO-CREATE] Upserting conversation: chat_id={chat_id}, title={title}, type={chat_type}")
+            result = await self._run_db(self._upsert_conversation, chat_id, title, chat_type)
 
-            if row:
-                result = {
-                    'id': row[0],
-                    'title': row[1],
-                    'type': row[2],
-                    'is_sync_disabled': row[3]
-                }
+            if result:
                 # Update cache
                 self._conversation_cache[str(chat_id)] = result
 
                 # Record successful creation
                 log(f"[AUTO-CREATE] SUCCESS: Created conversation {result['title']} (id={result['id']})")
                 try:
-                    self.state_manager.record_conversation_created(chat_id, result['title'], result['type'])
+                    await self._run_state(
+                        self.state_manager.record_conversation_created,
+                        chat_id, result['title'], result['type']
+                    )
                 except:
                     pass
 
@@ -1596,32 +2137,88 @@ class RealtimeListener:
                     try:
                         await self._sync_group_members(result['id'], chat_id, entity)
                     except Exception as member_err:
-                        log(f"[AUTO-CREATE] Failed to sync members (non-fatal): {member_err}", level='WARN')
+                        log("[AUTO-CREATE] Failed to sync members (non-fatal): %s", member_err, level='WARN')
 
                 return result
             else:
-                log(f"[AUTO-CREATE] WARNING: No row returned from INSERT", level='WARN')
+                log("[AUTO-CREATE] WARNING: No row returned from INSERT", level='WARN')
 
         except Exception as e:
-            self.conn.rollback()
             error_msg = f"Database error creating conversation {chat_id}: {e}"
-            log(f"[AUTO-CREATE] {error_msg}", level='ERROR')
+            log("[AUTO-CREATE] %s", error_msg, level='ERROR')
             self._add_error(error_msg)
 
             # Record error for visibility
-            try:
-                self.state_manager.record_error(
-                    'conversation_create',
-                    str(e),
-                    {'chat_id': chat_id, 'title': title, 'type': chat_type}
+            self._record_error('conversation_create', str(e), {'chat_id': chat_id, 'title': title, 'type': chat_type})
+
+        return None
+
+    def _upsert_conversation(self, chat_id: int, title: str, chat_type: str) -> Optional[Dict]:
+        """
+        Insert or refresh a conversation and return it, in one round-trip.
+
+        ON CONFLICT ... DO UPDATE makes RETURNING yield the row whether it
+        was just created or already existed. Runs on a DB thread.
+        """
+        conv_id = make_id('c', f"telegram-{chat_id}")
+
+        with self._pooled_cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO telegram_crm."Conversation" (
+                    id, source, "externalChatId", title, type,
+                    "isSyncDisabled", "createdAt", "updatedAt"
                 )
-            except:
-                pass
+                VALUES (%s, 'telegram', %s, %s, %s, FALSE, NOW(), NOW())
+                ON CONFLICT (source, "externalChatId")
+                DO UPDATE SET title = EXCLUDED.title, "updatedAt" = NOW()
+                RETURNING id, title, type, "isSyncDisabled"
+            """, (conv_id, str(chat_id), title, chat_type))
+            row = cursor.fetchone()
 
-        finally:
-            cursor.close()
+        if not row:
+            return None
+        return {
+            'id': row[0],
+            'title': row[1],
+            'type': row[2],
+            'is_sync_disabled': row[3]
+        }
+
+    def _upsert_conversations(self, chats: List[tuple]) -> Dict[str, Dict]:
+        """
+        Batch form of _upsert_conversation for (chat_id, chat_type, title) rows.
 
-        return None
+        One multi-row INSERT ... RETURNING; returns {externalChatId: conversation}.
+        Runs on a DB thread.
+        """
+        rows = [
+            (make_id('c', f"telegram-{chat_id}"), str(chat_id), title, chat_type)
+            for chat_id, chat_type, title in chats
+        ]
+        with self._pooled_cursor() as cursor:
+            returned = execute_values(cursor, """
+                INSERT INTO telegram_crm."Conversation" (
+                    id, source, "externalChatId", title, type,
+                    "isSyncDisabled", "createdAt", "updatedAt"
+                )
+                VALUES %s
+                ON CONFLICT (source, "externalChatId")
+                DO UPDATE SET title = EXCLUDED.title, "updatedAt" = NOW()
+                RETURNING "externalChatId", id, title, type, "isSyncDisabled"
+            """, rows,
+                template="(%s, 'telegram', %s, %s, %s, FALSE, NOW(), NOW())",
+                page_size=len(rows),
+                fetch=True)
+
+        return {
+            row[0]: {
+                'id': row[1],
+                'title': row[2],
+                'type': row[3],
+                'is_sync_disabled': row[4]
+            }
+            for row in returned
+        }
 
     async def _sync_group_members(self, conversation_id: str, chat_id: int, entity) -> int:
         """
@@ -1674,7 +2271,7 @@ class RealtimeListener:
                         role = 'administrator'
 
                 # Generate a unique member ID
-                member_id = 'm' + hashlib.md5(f"{conversation_id}-{external_user_id}".encode()).hexdigest()[:24]
+                member_id = make_id('m', f"{conversation_id}-{external_user_id}")
 
                 try:
                     cursor.execute("""
@@ -1693,7 +2290,7 @@ class RealtimeListener:
                           first_name, last_name, role))
                     synced_count += 1
                 except Exception as e:
-                    log(f"[MEMBER-SYNC] Error inserting member {external_user_id}: {e}", level='WARN')
+                    log("[MEMBER-SYNC] Error inserting member %s: %s", external_user_id, e, level='WARN')
                     continue
 
             self.conn.commit()
@@ -1701,7 +2298,7 @@ class RealtimeListener:
 
         except Exception as e:
             self.conn.rollback()
-            log(f"[MEMBER-SYNC] ERROR syncing members: {e}", level='ERROR')
+            log("[MEMBER-SYNC] ERROR syncing members: %s", e, level='ERROR')
             raise
         finally:
             cursor.close()
@@ -1730,12 +2327,14 @@ class RealtimeListener:
         # Wait 60 seconds before first poll to let catch-up complete
         await asyncio.sleep(60)
 
+        # Doubles after a Telegram flood wait (up to ACTIVE_POLL_INTERVAL_MAX),
+        # back to the base once a poll goes through cleanly
+        interval = ACTIVE_POLL_INTERVAL
+
         while self.running and not self._shutdown_requested:
             try:
                 log("[ACTIVE-POLL] ========== STARTING ACTIVE POLL ==========")
                 start_time = datetime.now(timezone.utc)
-                messages_synced = 0
-                conversations_checked = 0
 
                 # Get most recently active conversations from database
                 cursor = self.conn.cursor()
@@ -1751,32 +2350,15 @@ class RealtimeListener:
                 conversations = cursor.fetchall()
                 cursor.close()
 
-                for conv_id, chat_id, title, last_synced_id in conversations:
-                    if self._shutdown_requested:
-                        break
-
-                    conversations_checked += 1
-                    min_id = int(last_synced_id) if last_synced_id else 0
-
-                    try:
-                        # Fetch recent messages from Telegram
-                        messages_found = 0
-                        async for msg in self.client.iter_messages(
-                            int(chat_id),
-                            min_id=min_id,
-                            limit=ACTIVE_POLL_MESSAGES_PER_CONV
-                        ):
-                            if isinstance(msg, Message) and msg.id and str(msg.id) != str(last_synced_id):
-                                # Enqueue for central processor (same path as events)
-                                await self._enqueue_message(msg, source='poll')
-                                messages_found += 1
-
-                        if messages_found > 0:
-                            messages_synced += messages_found
-                            log(f"[ACTIVE-POLL] {title}: {messages_found} messages queued")
-
-                    except Exception as e:
-                        log(f"[ACTIVE-POLL] Error polling {title}: {e}", level='WARN')
+                # Enqueue for central processor (same path as events)
+                conversations_checked, messages_synced, _, flood_wait = await self._poll_conversations(
+                    conversations, 'poll', 'ACTIVE-POLL'
+                )
+                if flood_wait:
+                    interval = min(interval * 2, ACTIVE_POLL_INTERVAL_MAX)
+                    await asyncio.sleep(flood_wait + 5)
+                else:
+                    interval = ACTIVE_POLL_INTERVAL
 
                 elapsed = (datetime.now(timezone.utc) - start_time).total_seconds()
                 log(f"[ACTIVE-POLL] ========== POLL COMPLETE ==========")
@@ -1784,16 +2366,92 @@ class RealtimeListener:
 
                 # Record poll results
                 try:
-                    self.state_manager.record_poll(conversations_checked, messages_synced)
+                    await self._run_state(self.state_manager.record_poll,
+                                          conversations_checked, messages_synced)
                 except:
                     pass
 
             except Exception as e:
-                log(f"[ACTIVE-POLL] Error in poll loop: {e}", level='ERROR')
-                traceback.print_exc()
+                log("[ACTIVE-POLL] Error in poll loop: %s", e, level='ERROR')
+                self._print_exc()
 
             # Wait for next poll interval
-            await asyncio.sleep(ACTIVE_POLL_INTERVAL)
+            await asyncio.sleep(jittered(interval))
+
+    async def _poll_conversations(self, conversations: List[tuple], source: str, tag: str) -> tuple:
+        """
+        Enqueue new messages from many conversations, a few at a time.
+
+        Each (id, externalChatId, title, lastSyncedMessageId) row is fetched
+        from Telegram with up to CATCH_UP_CONCURRENCY fetches in flight, so
+        the per-conversation round-trips overlap instead of adding up.
+
+        A FloodWaitError stops the remaining fetches (no point hammering a
+        rate limit). Returns (conversations checked, messages queued,
+        errors, longest flood wait in seconds or 0).
+        """
+        semaphore = asyncio.Semaphore(CATCH_UP_CONCURRENCY)
+        checked = queued = errors = flood_wait = 0
+
+        async def poll_one(conv_id, chat_id, title, last_synced_id):
+            nonlocal checked, queued, errors, flood_wait
+            async with semaphore:
+                if self._shutdown_requested or flood_wait:
+                    return
+
+                checked += 1
+                min_id = int(last_synced_id) if last_synced_id else 0
+
+                try:
+                    # Fetch recent messages from Telegram
+                    fetched = [
+                        msg async for msg in self.client.iter_messages(
+                            int(chat_id),
+                            min_id=min_id,
+                            limit=ACTIVE_POLL_MESSAGES_PER_CONV
+                        )
+                        if isinstance(msg, Message) and msg.id and str(msg.id) != str(last_synced_id)
+                    ]
+
+                    # One query for the ones already stored, so they're skipped
+                    # in memory instead of each costing an INSERT round-trip
+                    existing = set()
+                    if fetched:
+                        existing = await self._run_db(
+                            self._existing_message_ids, conv_id, [str(msg.id) for msg in fetched]
+                        )
+
+                    messages_found = 0
+                    for msg in fetched:
+                        if str(msg.id) in existing:
+                            msg_chat_id = self._get_chat_id(msg)
+                            if msg_chat_id:
+                                self._mark_processed(f"{msg_chat_id}:{msg.id}")
+                            continue
+                        await self._enqueue_message(msg, source=source)
+                        messages_found += 1
+
+                    if messages_found > 0:
+                        queued += messages_found
+                        log(f"[{tag}] {title}: {messages_found} messages queued")
+
+                except FloodWaitError as e:
+                    errors += 1
+                    flood_wait = max(flood_wait, e.seconds)
+                    log("[%s] Flood wait (%ss) polling %s", tag, e.seconds, title, level='WARN')
+
+                except Exception as e:
+                    errors += 1
+                    log("[%s] Error polling %s: %s", tag, title, e, level='WARN')
+
+        await asyncio.gather(*(poll_one(*row) for row in conversations))
+        return checked, queued, errors, flood_wait
+
+    def _existing_message_ids(self, conversation_id: str, external_ids: List[str]) -> set:
+        """Which of these external message IDs are already stored (runs on a DB thread)."""
+        with self._pooled_cursor() as cursor:
+            cursor.execute(SELECT_EXISTING_MESSAGE_IDS_SQL, (conversation_id, external_ids))
+            return {row[0] for row in cursor.fetchall()}
 
     async def _full_catchup_loop(self):
         """
@@ -1813,13 +2471,13 @@ class RealtimeListener:
         # Wait before first run (let other tasks initialize)
         await asyncio.sleep(180)  # 3 minutes after startup
 
+        # Same flood-wait backoff as the active poll
+        interval = FULL_CATCHUP_INTERVAL
+
         while self.running and not self._shutdown_requested:
             try:
                 log("[FULL-CATCHUP] ========== STARTING FULL CATCH-UP ==========")
                 start_time = datetime.now(timezone.utc)
-                messages_synced = 0
-                conversations_synced = 0
-                errors = 0
 
                 # Get ALL conversations ordered by lastSyncedAt (oldest first)
                 # This prioritizes conversations that haven't been synced recently
@@ -1838,230 +2496,466 @@ class RealtimeListener:
 
                 log(f"[FULL-CATCHUP] Syncing {len(conversations)} conversations (oldest-synced first)")
 
-                for conv_id, chat_id, title, last_synced_id in conversations:
-                    if self._shutdown_requested:
-                        break
-
-                    min_id = int(last_synced_id) if last_synced_id else 0
-
-                    try:
-                        # Fetch recent messages from Telegram
-                        messages_found = 0
-                        async for msg in self.client.iter_messages(
-                            int(chat_id),
-                            min_id=min_id,
-                            limit=ACTIVE_POLL_MESSAGES_PER_CONV
-                        ):
-                            if isinstance(msg, Message) and msg.id and str(msg.id) != str(last_synced_id):
-                                await self._enqueue_message(msg, source='catchup')
-                                messages_found += 1
-
-                        if messages_found > 0:
-                            messages_synced += messages_found
-                            log(f"[FULL-CATCHUP] {title}: {messages_found} messages queued")
-
-                        conversations_synced += 1
-
-                    except Exception as e:
-                        errors += 1
-                        log(f"[FULL-CATCHUP] Error syncing {title}: {e}", level='WARN')
+                checked, messages_synced, errors, flood_wait = await self._poll_conversations(
+                    conversations, 'catchup', 'FULL-CATCHUP'
+                )
+                conversations_synced = checked - errors
+                if flood_wait:
+                    interval = min(interval * 2, FULL_CATCHUP_INTERVAL_MAX)
+                    await asyncio.sleep(flood_wait + 5)
+                else:
+                    interval = FULL_CATCHUP_INTERVAL
 
                 elapsed = (datetime.now(timezone.utc) - start_time).total_seconds()
                 log(f"[FULL-CATCHUP] ========== CATCH-UP COMPLETE ==========")
                 log(f"[FULL-CATCHUP] Synced: {conversations_synced} conversations, {messages_synced} messages, Errors: {errors}, Time: {elapsed:.1f}s")
 
             except Exception as e:
-                log(f"[FULL-CATCHUP] Error in catch-up loop: {e}", level='ERROR')
-                traceback.print_exc()
+                log("[FULL-CATCHUP] Error in catch-up loop: %s", e, level='ERROR')
+                self._print_exc()
 
             # Wait for next interval
-            await asyncio.sleep(FULL_CATCHUP_INTERVAL)
+            await asyncio.sleep(jittered(interval))
 
-    async def _dialog_discovery_loop(self):
+    async def _run_discovery_pass(self):
         """
-        100x RELIABLE SYNC: Periodic dialog discovery.
+        100x RELIABLE SYNC: One dialog discovery pass.
 
-        Runs every DIALOG_DISCOVERY_INTERVAL to discover new conversations
-        that may not have sent messages yet. This catches:
+        Scheduled every DIALOG_DISCOVERY_INTERVAL by _periodic_loop to
+        discover new conversations that may not have sent messages yet.
+        This catches:
         - New chats created while listener was offline
         - Conversations with only outgoing messages
         - Groups/channels joined via links
 
         This is the "belt" to the auto-create "suspenders" approach.
         """
-        log("[DISCOVERY] Starting periodic dialog discovery task...")
-        log(f"[DISCOVERY] Will run every {DIALOG_DISCOVERY_INTERVAL} seconds, scanning up to {DIALOG_DISCOVERY_LIMIT} dialogs")
+        try:
+            log("[DISCOVERY] ========== STARTING DIALOG DISCOVERY ==========")
+            discovered = 0
+            already_known = 0
+            status_synced = 0
+            errors = 0
+            dialogs_scanned = 0
+
+            # Iterate through dialogs from Telegram
+            try:
+                dialogs = [d async for d in self.client.iter_dialogs(limit=DIALOG_DISCOVERY_LIMIT)]
 
-        # Run immediately on startup, then wait for interval
-        first_run = True
+                # One query for every dialog not already cached, instead of
+                # a SELECT per dialog
+                known = {}
+                uncached = [str(d.id) for d in dialogs if str(d.id) not in self._conversation_cache]
+                if uncached:
+                    try:
+                        known = await self._run_db(self._find_conversations, uncached)
+                    except Exception as e:
+                        log("[DISCOVERY] Database check failed: %s", e, level='WARN')
+                        known = None
 
-        while self.running and not self._shutdown_requested:
-            if first_run:
-                log("[DISCOVERY] Running initial discovery in 30 seconds...")
-                await asyncio.sleep(30)  # Short wait on startup
-                first_run = False
-            else:
-                await asyncio.sleep(DIALOG_DISCOVERY_INTERVAL)
+                new_dialogs = []
+                for dialog in dialogs:
+                    if self._shutdown_requested:
+                        log("[DISCOVERY] Shutdown requested, stopping discovery")
+                        break
 
-            if self._shutdown_requested:
-                break
+                    dialogs_scanned += 1
+                    chat_id = dialog.id
+                    external_id = str(chat_id)
+                    dialog_name = dialog.name or dialog.title or f"Chat {chat_id}"
+
+                    # Check if we already have this conversation in cache
+                    if external_id in self._conversation_cache:
+                        cached_conv = self._conversation_cache[external_id]
+                        if cached_conv and cached_conv.get('id'):
+                            # LINEAR-STYLE: Sync unread + user status for ALL existing dialogs
+                            if await self._sync_dialog_status(dialog, cached_conv['id'], dialog_name):
+                                status_synced += 1
+                        already_known += 1
+                        continue
 
-            try:
-                log("[DISCOVERY] ========== STARTING DIALOG DISCOVERY ==========")
-                discovered = 0
-                already_known = 0
-                status_synced = 0
-                errors = 0
-                dialogs_scanned = 0
-
-                # Iterate through dialogs from Telegram
-                try:
-                    async for dialog in self.client.iter_dialogs(limit=DIALOG_DISCOVERY_LIMIT):
-                        if self._shutdown_requested:
-                            log("[DISCOVERY] Shutdown requested, stopping discovery")
-                            break
-
-                        dialogs_scanned += 1
-                        chat_id = dialog.id
-                        external_id = str(chat_id)
-                        dialog_name = dialog.name or dialog.title or f"Chat {chat_id}"
-
-                        # Check if we already have this conversation in cache
-                        if external_id in self._conversation_cache:
-                            cached_conv = self._conversation_cache[external_id]
-                            if cached_conv and cached_conv.get('id'):
-                                # LINEAR-STYLE: Sync unread + user status for ALL existing dialogs
-                                if await self._sync_dialog_status(dialog, cached_conv['id'], dialog_name):
-                                    status_synced += 1
-                            already_known += 1
-                            continue
+                    # Database check failed for this pass - retry next time
+                    if known is None:
+                        errors += 1
+                        continue
 
-                        # Check database - fetch full conversation data for cache
-                        try:
-                            cursor = self.conn.cursor()
-                            cursor.execute("""
-                                SELECT id, title, type, "isSyncDisabled"
-                                FROM telegram_crm."Conversation"
-                                WHERE "externalChatId" = %s AND source = 'telegram'
-                            """, (external_id,))
-                            row = cursor.fetchone()
-                            cursor.close()
-
-                            if row:
-                                # Update cache with FULL conversation data (including 'id')
-                                conv_data = {
-                                    'id': row[0],
-                                    'title': row[1],
-                                    'type': row[2],
-                                    'is_sync_disabled': row[3]
-                                }
-                                self._conversation_cache[external_id] = conv_data
-                                # LINEAR-STYLE: Sync unread + user status for existing dialogs from DB
-                                if await self._sync_dialog_status(dialog, row[0], dialog_name):
-                                    status_synced += 1
-
-                                # 100x RELIABLE: Sync group members for existing groups (for @mention feature)
-                                # VERSION: MEMBER-SYNC-V2 - DEPLOYED 2025-12-10
-                                log(f"[DISCOVERY] Checking member sync for {dialog_name} (type={conv_data['type']})")
-                                if conv_data['type'] in ('group', 'supergroup'):
-                                    log(f"[DISCOVERY] Will sync members for group: {dialog_name}")
-                                    try:
-                                        entity = await self.client.get_entity(chat_id)
-                                        await self._sync_group_members(conv_data['id'], chat_id, entity)
-                                    except Exception as member_err:
-                                        log(f"[DISCOVERY] Failed to sync members for {dialog_name}: {member_err}", level='WARN')
-
-                                already_known += 1
-                                continue
-                        except Exception as e:
-                            log(f"[DISCOVERY] Database check failed for {dialog_name}: {e}", level='WARN')
-                            errors += 1
-                            continue
+                    conv_data = known.get(external_id)
+                    if conv_data:
+                        # Update cache with FULL conversation data (including 'id')
+                        self._conversation_cache[external_id] = conv_data
+                        # LINEAR-STYLE: Sync unread + user status for existing dialogs from DB
+                        if await self._sync_dialog_status(dialog, conv_data['id'], dialog_name):
+                            status_synced += 1
+
+                        # 100x RELIABLE: Sync group members for existing groups (for @mention feature)
+                        # VERSION: MEMBER-SYNC-V2 - DEPLOYED 2025-12-10
+                        log(f"[DISCOVERY] Checking member sync for {dialog_name} (type={conv_data['type']})")
+                        if conv_data['type'] in ('group', 'supergroup'):
+                            log(f"[DISCOVERY] Will sync members for group: {dialog_name}")
+                            try:
+                                entity = await self.client.get_entity(chat_id)
+                                await self._sync_group_members(conv_data['id'], chat_id, entity)
+                            except Exception as member_err:
+                                log("[DISCOVERY] Failed to sync members for %s: %s", dialog_name, member_err, level='WARN')
+
+                        already_known += 1
+                        continue
+
+                    # New conversation - created in one batch after the scan
+                    log(f"[DISCOVERY] NEW: {dialog_name} (chat_id={chat_id})")
+                    new_dialogs.append(dialog)
+
+                # Create every new conversation in one multi-row upsert (the
+                # dialog already carries its entity - no get_entity per chat)
+                created = {}
+                last_created = None
+                if new_dialogs:
+                    try:
+                        created = await self._run_db(
+                            self._upsert_conversations,
+                            [(d.id,) + chat_info(d.entity)[:2] for d in new_dialogs]
+                        )
+                    except Exception as e:
+                        log("[DISCOVERY] Error creating %s conversations: %s", len(new_dialogs), e, level='ERROR')
+                        self._record_error('conversation_create', str(e), {'count': len(new_dialogs)})
+
+                for dialog in new_dialogs:
+                    chat_id = dialog.id
+                    conv = created.get(str(chat_id))
+                    if not conv:
+                        log("[DISCOVERY] Failed to create conversation for %s", dialog.name or chat_id, level='WARN')
+                        errors += 1
+                        continue
 
-                        # New conversation - create it AND sync initial messages
-                        log(f"[DISCOVERY] NEW: {dialog_name} (chat_id={chat_id})")
+                    discovered += 1
+                    last_created = (chat_id, conv)
+                    self._conversation_cache[str(chat_id)] = conv
+                    log(f"[DISCOVERY] Created: {conv['title']} (type={conv['type']})")
+
+                    # 100x RELIABLE: Sync group members for groups/supergroups (for @mention feature)
+                    if conv['type'] in ('group', 'supergroup'):
                         try:
-                            conv = await self._create_conversation_from_chat(chat_id, source='discovery')
-                            if conv:
-                                discovered += 1
-                                log(f"[DISCOVERY] Created: {conv['title']} (type={conv['type']})")
-
-                                # CRITICAL: Sync initial messages so conversation appears in UI
-                                try:
-                                    msg_count = await self._sync_initial_messages(conv['id'], chat_id)
-                                    if msg_count > 0:
-                                        log(f"[DISCOVERY] Synced {msg_count} initial messages for {conv['title']}")
-                                except Exception as sync_err:
-                                    log(f"[DISCOVERY] Failed to sync initial messages for {conv['title']}: {sync_err}", level='WARN')
-                            else:
-                                log(f"[DISCOVERY] Failed to create conversation for {dialog_name}", level='WARN')
-                                errors += 1
-                        except Exception as e:
-                            log(f"[DISCOVERY] Error creating {dialog_name}: {e}", level='ERROR')
-                            errors += 1
+                            await self._sync_group_members(conv['id'], chat_id, dialog.entity)
+                        except Exception as member_err:
+                            log("[DISCOVERY] Failed to sync members (non-fatal): %s", member_err, level='WARN')
 
-                except Exception as e:
-                    error_msg = f"Failed to iterate dialogs: {e}"
-                    log(f"[DISCOVERY] {error_msg}", level='ERROR')
-                    self._add_error(error_msg)
+                    # CRITICAL: Sync initial messages so conversation appears in UI
+                    try:
+                        msg_count = await self._sync_initial_messages(conv['id'], chat_id)
+                        if msg_count > 0:
+                            log(f"[DISCOVERY] Synced {msg_count} initial messages for {conv['title']}")
+                    except Exception as sync_err:
+                        log("[DISCOVERY] Failed to sync initial messages for %s: %s", conv['title'], sync_err, level='WARN')
+
+                if last_created:
                     try:
-                        self.state_manager.record_error('dialog_iteration', str(e), None)
+                        await self._run_state(
+                            self.state_manager.record_conversation_created,
+                            last_created[0], last_created[1]['title'], last_created[1]['type']
+                        )
                     except:
                         pass
 
-                log(f"[DISCOVERY] ========== DISCOVERY COMPLETE ==========")
-                log(f"[DISCOVERY] Scanned: {dialogs_scanned}, New: {discovered}, Existing: {already_known}, StatusSynced: {status_synced}, Errors: {errors}")
-
-                # Update state with discovery results
-                try:
-                    self.state_manager.record_discovery(discovered, already_known)
-                except Exception as e:
-                    log(f"[DISCOVERY] Failed to record discovery stats: {e}", level='WARN')
-
             except Exception as e:
-                error_msg = f"Dialog discovery loop error: {e}"
+                error_msg = f"Failed to iterate dialogs: {e}"
+                log("[DISCOVERY] %s", error_msg, level='ERROR')
                 self._add_error(error_msg)
-                log(f"[DISCOVERY] {error_msg}", level='ERROR')
-                traceback.print_exc()
+                self._record_error('dialog_iteration', str(e))
 
-                try:
-                    self.state_manager.record_error('dialog_discovery', str(e), None)
-                except:
-                    pass
+            log(f"[DISCOVERY] ========== DISCOVERY COMPLETE ==========")
+            log(f"[DISCOVERY] Scanned: {dialogs_scanned}, New: {discovered}, Existing: {already_known}, StatusSynced: {status_synced}, Errors: {errors}")
 
-    async def _heartbeat_loop(self):
-        """Periodic heartbeat to maintain lock and update state."""
-        while self.running and not self._shutdown_requested:
+            # Update state with discovery results
             try:
-                self.lock_manager.heartbeat()
-                self._update_state('running')
+                await self._run_state(self.state_manager.record_discovery, discovered, already_known)
+            except Exception as e:
+                log("[DISCOVERY] Failed to record discovery stats: %s", e, level='WARN')
 
-                # Call callback
-                if self.on_heartbeat_callback:
-                    self.on_heartbeat_callback()
+        except Exception as e:
+            error_msg = f"Dialog discovery loop error: {e}"
+            self._add_error(error_msg)
+            log("[DISCOVERY] %s", error_msg, level='ERROR')
+            self._print_exc()
 
-            except Exception as e:
-                self._add_error(f"Heartbeat error: {e}")
-            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            self._record_error('dialog_discovery', str(e))
+
+    async def _beat(self):
+        """One heartbeat: maintain lock and update state."""
+        self._flush_tracebacks()
+        try:
+            # The lock row is a LOCK_TTL lease; extending it every beat is a
+            # wasted write, so only renew once half of it has been used.
+            # Blocking psycopg2 calls - keep them off the event loop
+            now = time.monotonic()
+            if now - self._lock_renewed_at > LOCK_TTL / 2:
+                await self._run_state(self.lock_manager.heartbeat)
+                self._lock_renewed_at = now
+            self._update_state('running')
+
+            # Call callback
+            self._fire(self.on_heartbeat_callback)
+
+        except Exception as e:
+            self._add_error(f"Heartbeat error: {e}")
+
+    async def _periodic_loop(self):
+        """
+        Single timer for the heartbeat and dialog discovery.
+
+        Sleeps until whichever deadline is next instead of keeping two
+        loops (and two timers) alive. The heartbeat beats every
+        HEARTBEAT_INTERVAL while messages are flowing and backs off 1.5x
+        per idle beat up to HEARTBEAT_MAX_INTERVAL; the next message brings
+        it straight back to the base cadence. Discovery passes run as a
+        child task so a long pass never delays a heartbeat, and never
+        overlap.
+        """
+        log("[DISCOVERY] Starting periodic dialog discovery task...")
+        log(f"[DISCOVERY] Will run every {DIALOG_DISCOVERY_INTERVAL} seconds, scanning up to {DIALOG_DISCOVERY_LIMIT} dialogs")
+        log("[DISCOVERY] Running initial discovery in 30 seconds...")
+
+        loop = asyncio.get_running_loop()
+        interval = HEARTBEAT_INTERVAL
+        last_seen = self.messages_received
+        last_beat = next_beat = loop.time()
+        next_discovery = next_beat + 30  # Short wait on startup
+        discovery = None
+
+        try:
+            while self.running and not self._shutdown_requested:
+                now = loop.time()
+
+                if now >= next_beat:
+                    await self._beat()
+                    if self.messages_received != last_seen:
+                        interval = HEARTBEAT_INTERVAL
+                    else:
+                        interval = interval * 1.5
+                        if interval > HEARTBEAT_MAX_INTERVAL:
+                            interval = HEARTBEAT_MAX_INTERVAL
+                    last_seen = self.messages_received
+
+                    # Absolute deadlines: the period doesn't stretch by the
+                    # beat's own DB time. If we fell a whole interval behind,
+                    # snap forward instead of bursting to catch up.
+                    last_beat = next_beat
+                    next_beat += interval
+                    if next_beat < loop.time():
+                        last_beat = next_beat = loop.time()
+
+                if discovery is not None and discovery.done():
+                    # The interval counts from the end of a pass (noticed at
+                    # the next wake-up), as it did in the dedicated loop
+                    discovery = None
+                    next_discovery = now + DIALOG_DISCOVERY_INTERVAL
+                elif discovery is None and now >= next_discovery:
+                    discovery = asyncio.create_task(self._run_discovery_pass())
+                    next_discovery = float('inf')
+
+                deadline = next_beat if next_beat < next_discovery else next_discovery
+                timeout = deadline - loop.time()
+                if timeout < 0.0:
+                    timeout = 0.0
+
+                if interval > HEARTBEAT_INTERVAL:
+                    # Backed off: wake early on activity and fall back to the base cadence
+                    self._activity_event.clear()
+                    try:
+                        await asyncio.wait_for(self._activity_event.wait(), timeout=timeout)
+                        interval = HEARTBEAT_INTERVAL
+                        if last_beat + interval < next_beat:
+                            next_beat = last_beat + interval
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    await asyncio.sleep(timeout)
+        finally:
+            if discovery is not None and not discovery.done():
+                discovery.cancel()
+                await asyncio.gather(discovery, return_exceptions=True)
+
+    def _fire(self, callback: Optional[Callable], *args) -> None:
+        """
+        Run a user callback without letting it stall or break the caller.
+
+        Sync callbacks are deferred to the next loop iteration (safe from DB
+        threads; exceptions go to the loop's handler). Coroutine callbacks
+        run as tasks, at most CALLBACK_MAX_PENDING at once - the oldest is
+        cancelled so a slow sink can never back-pressure the listener.
+        """
+        if not callback:
+            return
+        if self._loop is None:
+            callback(*args)
+        elif asyncio.iscoroutinefunction(callback):
+            self._loop.call_soon_threadsafe(self._start_callback_task, callback, args)
+        else:
+            self._loop.call_soon_threadsafe(callback, *args)
+
+    def _start_callback_task(self, callback: Callable, args: tuple) -> None:
+        """Start a coroutine callback, dropping the oldest one when too many are pending."""
+        while self._callback_tasks and self._callback_tasks[0].done():
+            self._callback_tasks.popleft()
+        if len(self._callback_tasks) >= CALLBACK_MAX_PENDING:
+            self._callback_tasks.popleft().cancel()
+        self._callback_tasks.append(self._loop.create_task(callback(*args)))
+
+    def _print_exc(self) -> None:
+        """
+        Buffer the current exception's traceback for the next heartbeat.
+
+        Formatting a full stack and writing it to stderr can take
+        milliseconds; during an error storm that would stall the loop, so
+        tracebacks are kept (bounded) and printed in one batch off the loop.
+        """
+        exc = sys.exc_info()[1]
+        if exc is None or self._loop is None:
+            traceback.print_exc()
+            return
+        if len(self._pending_tracebacks) == TRACEBACK_BUFFER_SIZE:
+            self._tracebacks_dropped += 1
+        self._pending_tracebacks.append(exc)
+
+    def _flush_tracebacks(self) -> None:
+        """Print buffered tracebacks from a worker thread (called each heartbeat)."""
+        if not self._pending_tracebacks:
+            return
+        excs = list(self._pending_tracebacks)
+        self._pending_tracebacks.clear()
+        dropped, self._tracebacks_dropped = self._tracebacks_dropped, 0
+        self._loop.run_in_executor(None, self._print_tracebacks, excs, dropped)
+
+    @staticmethod
+    def _print_tracebacks(excs: List[BaseException], dropped: int) -> None:
+        """Print a batch of tracebacks (runs on a worker thread)."""
+        for exc in excs:
+            traceback.print_exception(exc)
+        if dropped:
+            log("%s more tracebacks dropped (buffer full)", dropped, level='WARN')
+
+    def _queue_state_write(self, kind: str, value) -> None:
+        """
+        Queue a state write for _state_writer (never blocks).
+
+        When the queue is full the oldest entry is dropped, so during an
+        error storm the most recent errors and status are what get written.
+        """
+        try:
+            self._state_queue.put_nowait((kind, value))
+        except asyncio.QueueFull:
+            self._state_queue.get_nowait()
+            self._state_queue.put_nowait((kind, value))
+            self._state_dropped += 1
+            if self._state_dropped % STATE_QUEUE_SIZE == 1:
+                log("State queue full - dropped %s oldest state updates", self._state_dropped, level='WARN')
+
+    def _count_message_stat(self):
+        """Queue a messages-received increment."""
+        self._queue_state_write('count', 1)
+        self._activity_event.set()
+
+    def _record_error(self, error_type: str, error_message: str, context: Optional[Dict] = None):
+        """Queue an error for the ListenerState error log."""
+        self._queue_state_write('error', {
+            'type': error_type,
+            'message': error_message,
+            'context': context,
+            'timestamp': utc_iso_now()
+        })
+
+    async def _state_writer(self):
+        """
+        Drain queued state writes on the state thread, coalescing each burst.
+
+        Message counts are summed, only the latest status is kept, and
+        errors are appended in one statement - at most three writes per
+        flush however many updates queued up.
+        """
+        self._state_writer_active = True
+        try:
+            while True:
+                batch = [await self._state_queue.get()]
+                while not self._state_queue.empty():
+                    batch.append(self._state_queue.get_nowait())
+
+                count = 0
+                status = None
+                errors = []
+                for kind, value in batch:
+                    if kind == 'count':
+                        count += value
+                    elif kind == 'state':
+                        status = value
+                    else:
+                        errors.append(value)
+
+                try:
+                    await self._run_state(self._flush_state, count, status, errors)
+                except Exception as e:
+                    log("Failed to flush listener state: %s", e, level='WARN')
+        finally:
+            self._state_writer_active = False
+
+    def _flush_state(self, count: int, status: Optional[str], errors: List[Dict]):
+        """Write one coalesced batch of state updates (runs on the state thread)."""
+        if count:
+            self.state_manager.increment_messages(count)
+        if status:
+            self._write_state(status)
+        if errors:
+            self.state_manager.record_errors(errors)
 
     def _update_state(self, status: str):
-        """Update listener state in database."""
+        """Update listener state in database (queued while the state writer runs)."""
+        if self._state_writer_active:
+            self._queue_state_write('state', status)
+        elif self._state_executor:
+            # Still on the state thread, so it stays ordered with other
+            # lock/state writes (stop() waits for it on executor shutdown)
+            self._state_executor.submit(self._write_state, status)
+        else:
+            self._write_state(status)
+
+    def _write_state(self, status: str):
+        """
+        Write listener state to the database now.
+
+        When nothing changed since the last write, only lastHeartbeat is
+        touched (the dashboard still needs it) instead of re-upserting the
+        whole row with its errors JSON.
+        """
+        state_key = (status, self.messages_received, len(self._error_messages))
         try:
-            self.state_manager.update_state(status, self.messages_received, self.errors[-10:])
+            if state_key == self._last_state_key:
+                self.state_manager.touch_heartbeat()
+            else:
+                self.state_manager.update_state(status, self.messages_received, self._state_errors_json)
+                self._last_state_key = state_key
         except Exception as e:
-            log(f"Failed to update DB state: {e}", level='WARN')
+            log("Failed to update DB state: %s", e, level='WARN')
+
+    def _state_errors(self) -> List[Dict]:
+        """The last STATE_ERRORS errors, as ListenerState error entries."""
+        start = max(len(self._error_messages) - STATE_ERRORS, 0)
+        return [
+            {'error': message, 'timestamp': utc_iso(ts)}
+            for ts, message in zip(islice(self._error_times, start, None),
+                                   islice(self._error_messages, start, None))
+        ]
 
     def _add_error(self, error: str):
         """Add error to error list."""
-        self.errors.append({
-            'error': error,
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        })
-        log(f"ERROR: {error}", level='ERROR')
+        error = canonical_error(error)
+        self._error_times.append(int(time.time()))
+        self._error_messages.append(error)
+        # Serialize once here (on the loop, the only writer of the deques)
+        # rather than rebuilding the dicts on every state write
+        self._state_errors_json = orjson.dumps(self._state_errors()).decode()
+        self._last_state_key = None  # Flush the new error with the next state write
+        log("ERROR: %s", error, level='ERROR')
 
         # Call callback
-        if self.on_error_callback:
-            self.on_error_callback(error)
+        self._fire(self.on_error_callback, error)
 
     # =========================================================================
     # LINEAR-STYLE OUTBOX: Outgoing Message Processor
@@ -2142,10 +3036,10 @@ class RealtimeListener:
                 except Exception as e:
                     self.conn.rollback()
                     cursor.close()
-                    log(f"[OUTBOX] Error claiming message: {e}", "ERROR")
+                    log("[OUTBOX] Error claiming message: %s", e, level='ERROR')
 
             except Exception as e:
-                log(f"[OUTBOX] Loop error: {e}", "ERROR")
+                log("[OUTBOX] Loop error: %s", e, level='ERROR')
                 await asyncio.sleep(5)
 
         log("[OUTBOX] Outgoing message processor stopped")
@@ -2287,16 +3181,14 @@ class RealtimeListener:
                 # TELEGRAM-STYLE: Create Message record immediately for instant display
                 # This ensures sender sees the message with attachment inline right away
                 message_date = sent_message.date.replace(tzinfo=timezone.utc) if sent_message.date else datetime.now(timezone.utc)
-                db_msg_id = 'm' + hashlib.md5(
-                    f"{sent_message.id}-{message_date.timestamp()}".encode()
-                ).hexdigest()[:24]
+                db_msg_id = make_id('m', f"{sent_message.id}-{message_date.timestamp()}")
 
                 # Build attachments JSON with correct path for outgoing files
                 attachments_json = None
                 has_attachments = bool(attach_type and attach_url)
                 if has_attachments:
                     # Use /media/outgoing/{storageKey} path which the frontend serves from FileUpload table
-                    attachments_json = Json({
+                    attachments_json = as_json({
                         'files': [{
                             'type': attach_type,
                             'path': f'/media/outgoing/{attach_url}',  # attach_url is the storage key
@@ -2324,7 +3216,7 @@ class RealtimeListener:
                     message_date,
                     has_attachments,
                     attachments_json,
-                    Json({'outbox_msg_id': msg_id})  # Track origin
+                    as_json({'outbox_msg_id': msg_id})  # Track origin
                 ))
 
                 # Update conversation lastMessageAt
@@ -2340,7 +3232,7 @@ class RealtimeListener:
                 log(f"[OUTBOX] SENT to {title}: {(text or attach_type or '')[:50]}...")
             except Exception as db_error:
                 # DB update failed but message was sent - log and mark sent anyway
-                log(f"[OUTBOX] DB update failed after send: {db_error}", "WARN")
+                log("[OUTBOX] DB update failed after send: %s", db_error, level='WARN')
                 try:
                     self.conn.rollback()
                     cursor = self.conn.cursor()
@@ -2365,7 +3257,7 @@ class RealtimeListener:
             # CRITICAL: Only retry if we haven't sent the message yet!
             if sent_message is not None:
                 # Message was sent but something else failed - mark as sent, don't retry
-                log(f"[OUTBOX] Post-send error for {msg_id} (msg sent): {error_msg}", "WARN")
+                log("[OUTBOX] Post-send error for %s (msg sent): %s", msg_id, error_msg, level='WARN')
                 try:
                     cursor = self.conn.cursor()
                     cursor.execute("""
@@ -2385,7 +3277,7 @@ class RealtimeListener:
                 return
 
             # Message was NOT sent - safe to retry
-            log(f"[OUTBOX] FAILED to send {msg_id}: {error_msg}", "ERROR")
+            log("[OUTBOX] FAILED to send %s: %s", msg_id, error_msg, level='ERROR')
 
             # Update as failed or retry
             try:
@@ -2420,7 +3312,7 @@ class RealtimeListener:
                 self.conn.commit()
                 cursor.close()
             except Exception as db_error:
-                log(f"[OUTBOX] Failed to update error status: {db_error}", "ERROR")
+                log("[OUTBOX] Failed to update error status: %s", db_error, level='ERROR')
                 try:
                     self.conn.rollback()
                 except:
@@ -2429,6 +3321,7 @@ class RealtimeListener:
 
 # Standalone execution for testing
 if __name__ == '__main__':
+    import contextlib
     import signal
     from pathlib import Path
 
@@ -2443,13 +3336,15 @@ if __name__ == '__main__':
         )
 
         # Handle shutdown signals
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
 
         def shutdown_handler():
             listener.request_shutdown()
 
         for sig in (signal.SIGINT, signal.SIGTERM):
-            loop.add_signal_handler(sig, shutdown_handler)
+            # Not available on Windows event loops
+            with contextlib.suppress(NotImplementedError):
+                loop.add_signal_handler(sig, shutdown_handler)
 
         try:
             await listener.start()
@@ -2457,4 +3352,12 @@ if __name__ == '__main__':
             print(f"Fatal error: {e}")
             traceback.print_exc()
 
-    asyncio.run(main())
+    # Prefer uvloop's libuv event loop when available (same as main.py)
+    try:
+        import uvloop
+        loop_factory = uvloop.new_event_loop
+    except ImportError:
+        loop_factory = None
+
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        runner.run(main())
@@ -168,14 +168,15 @@ def restore_session_from_env() -> bool:
         return False
 
 
-def backup_session():
+def backup_session() -> bool:
     """
     Create a backup of the current session file.
 
     Called periodically to ensure we can recover from corruption.
+    Errors are logged, not raised; returns True if a backup was written.
     """
     if not SESSION_FILE.exists():
-        return
+        return False
 
     try:
         BACKUP_DIR.mkdir(parents=True, exist_ok=True)
@@ -193,8 +194,11 @@ def backup_session():
             old_backup.unlink()
             log(f"Removed old backup: {old_backup.name}")
 
+        return True
+
     except Exception as e:
         log(f"WARNING: Failed to backup session: {e}")
+        return False
 
 
 def save_session_to_database() -> bool:
@@ -300,7 +304,8 @@ if __name__ == '__main__':
         sys.exit(0 if success else 1)
 
     elif command == 'backup':
-        backup_session()
+        success = backup_session()
+        sys.exit(0 if success else 1)
 
     elif command == 'save':
         success = save_session_to_database()